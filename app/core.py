@@ -1,62 +1,136 @@
 import logging
-from config.loader import ConfigSchema
-from classes.mqtt_sender import MqttHandler
-from classes.specific_serial_handler import Edwards_iO1000, Edwards_EST3x, Notifier_NFS, Simplex
-from app_utils.queue_operations import SafeQueue
-from components.update_app import update_check_thread
-from components.relay_controller import RelayController
-from components.queue_manager import QueueManager
+import random
+import threading
+import time
+from typing import Dict, List
+from app_utils.boot_timeline import BootTimeline
+from config.loader import ConfigSchema, load_panel_grammars
+from config.schema import PanelGrammarConfig, PanelPortConfig
+from classes.panel_grammar import PanelGrammar, DEFAULT_GRAMMAR_PATH
+from classes.specific_serial_handler import GrammarSerialHandler
+from components.queue_manager import QueueManager, create_queue
 from components.thread_manager import ThreadManager
-from classes.relay_monitor import RelayMonitor
+from components.stats_reporter import StatsReporter
 from classes.serial_port_handler import SerialPortHandler
+# The MQTT client, GPIO and relay modules are imported by _start_uplink, after serial capture has begun
 
 class Application:
-    def __init__(self, config: ConfigSchema, event_severity_levels: dict):
+    def __init__(self, config: ConfigSchema, event_severity_levels: dict, panel_grammars: Dict[int, PanelGrammarConfig] | None = None,
+                 timeline: BootTimeline | None = None):
         self.config = config
         self.event_severity_levels = event_severity_levels
-        self.queue = SafeQueue()
-        self.mqtt_handler = MqttHandler(self.config, self.queue)
+        self.panel_grammars = panel_grammars if panel_grammars is not None else load_panel_grammars(DEFAULT_GRAMMAR_PATH)
+        self.timeline = timeline or BootTimeline()
+        self.queue = create_queue(config.queue)
         self.id_modelo_panel: int = self.config.id_modelo_panel
-        self.serial_handler: SerialPortHandler = None
+        self.serial_handlers: List[SerialPortHandler] = []
+        self.grammars: Dict[int, PanelGrammar] = {}
 
-        self.queue_manager = QueueManager(self.queue, "queue_backup.pkl")
-        self.relay_controller = RelayController(config.relay)
-        self.relay_monitor = RelayMonitor(config, self.mqtt_handler)
+        self.queue_manager = QueueManager(self.queue, "queue_backup.pkl", config.queue)
         self.thread_manager = ThreadManager()
+        self.stats_reporter = StatsReporter(config.stats_interval)
+        # Built by _start_uplink
+        self.mqtt_handler = None
+        self.relay_controller = None
+        self.relay_monitor = None
+        self.stopping = threading.Event()
 
+        self.start_time = time.monotonic()
         self.logger = logging.getLogger(__name__)
 
-    def _create_serial_handler(self):
-        severity_list = self.event_severity_levels.get(self.id_modelo_panel, {})
-        
-        handlers = {
-            10001: Edwards_iO1000,
-            10002: Edwards_EST3x,
-            10003: Notifier_NFS,
-            10004: Simplex
-        }
-        
-        handler_class = handlers.get(self.id_modelo_panel)
-        if not handler_class:
-            raise ValueError(f"Unsupported panel model: {self.id_modelo_panel}")
-        
-        return handler_class(self.config, severity_list, self.queue)
+    def _panel_ports(self) -> List[PanelPortConfig]:
+        panels = [PanelPortConfig(puerto=self.config.serial.puerto, id_modelo_panel=self.id_modelo_panel)]
+        panels.extend(self.config.panels)
+        return panels
+
+    def _get_grammar(self, id_modelo_panel: int) -> PanelGrammar:
+        if id_modelo_panel not in self.grammars:
+            grammar_config = self.panel_grammars.get(id_modelo_panel)
+            if not grammar_config:
+                raise ValueError(f"Unsupported panel model: {id_modelo_panel}")
+            self.grammars[id_modelo_panel] = PanelGrammar(id_modelo_panel, grammar_config)
+        return self.grammars[id_modelo_panel]
+
+    def _create_serial_handler(self, panel: PanelPortConfig, multi_port: bool):
+        severity_list = self.event_severity_levels.get(panel.id_modelo_panel, {})
+        grammar = self._get_grammar(panel.id_modelo_panel)
+        source = (panel.name or panel.puerto) if multi_port else None
+        self.logger.info(f"Using panel grammar {grammar.name} for model {panel.id_modelo_panel} on {panel.puerto}")
+        return GrammarSerialHandler(self.config, severity_list, self.queue, grammar, panel.puerto, source)
+
+    def _create_serial_handlers(self) -> List[SerialPortHandler]:
+        panels = self._panel_ports()
+        return [self._create_serial_handler(panel, len(panels) > 1) for panel in panels]
+
+    def _serial_ready(self, port: str) -> None:
+        self.logger.info(f"Serial reader on {port} ready {(time.monotonic() - self.start_time) * 1000:.0f} ms after start")
+        self.timeline.mark("serial open")
+        self.timeline.log()
+
+    def _start_uplink(self) -> None:
+        # Everything that talks to the network or the GPIO pins; none of it is needed to capture panel events
+        from classes.mqtt_sender import MqttHandler
+        from classes.relay_monitor import RelayMonitor
+        from components.relay_controller import RelayController
+        self.timeline.mark("mqtt imported")
+
+        # Kept only once all three are built, so a failed attempt leaves nothing half started for the next one
+        mqtt_handler = MqttHandler(self.config, self.queue)
+        relay_controller = RelayController(self.config.relay)
+        relay_monitor = RelayMonitor(self.config, mqtt_handler)
+        self.mqtt_handler, self.relay_controller, self.relay_monitor = mqtt_handler, relay_controller, relay_monitor
+        if self.stopping.is_set():
+            return
+        self.stats_reporter.register(mqtt_handler.latency_tracker.summary)
+        self.stats_reporter.register(mqtt_handler.connection_summary)
+        self.thread_manager.start_threads([relay_monitor.monitor_relays, relay_controller.relay_control])
+        mqtt_handler.start()
+
+    def _wait_for_uplink(self) -> None:
+        # Only for the timeline; the publisher itself is woken by the CONNACK
+        while not self.stopping.is_set():
+            if self.mqtt_handler.connected.wait(1):
+                self.timeline.mark("mqtt connected")
+                self.timeline.log()
+                return
+
+    def _start_uplink_in_background(self) -> None:
+        delay = self.config.thingsboard.reconnect_min_delay
+        while not self.stopping.is_set():
+            try:
+                self._start_uplink()
+            except Exception as e:
+                # Serial capture goes on and the queue keeps every event until the uplink starts; retried with
+                # the same jittered backoff as an MQTT reconnect
+                wait = random.uniform(delay / 2, delay)
+                self.logger.error(f"Failed to start MQTT and relay monitoring: {e}. Retrying in {wait:.1f} s")
+                self.stopping.wait(wait)
+                delay = min(delay * 2, self.config.thingsboard.reconnect_max_delay)
+                continue
+            self._wait_for_uplink()
+            return
 
     def start(self):
         self.logger.info("Starting application...")
+        self.start_time = time.monotonic()
+        # Persisted messages are restored by the queue manager thread while serial is already being read
         self.queue_manager.load_queue()
-        self.mqtt_handler.start()
-        
-        self.serial_handler = self._create_serial_handler()
-        
-        threads = [
-            self.queue_manager.save_queue_periodically,
-            self.relay_monitor.monitor_relays,
-            self.relay_controller.relay_control,
-            self.serial_handler.listening_to_serial
-        ]
-
-        self.thread_manager.start_threads(threads)
+        self.timeline.mark("queue loaded")
+
+        self.serial_handlers = self._create_serial_handlers()
+        for handler in self.serial_handlers:
+            handler.on_ready = self._serial_ready
+            self.stats_reporter.register(handler.statistics.summary)
+        serial_threads = [(f"listening_to_serial:{handler.port}", handler.listening_to_serial) for handler in self.serial_handlers]
+
+        if self.config.startup == "eager":
+            # The previous order: MQTT client and GPIO set up before the first serial read
+            self._start_uplink()
+            threading.Thread(target=self._wait_for_uplink, name="uplink", daemon=True).start()
+        self.thread_manager.start_threads(serial_threads)
+        self.thread_manager.start_threads([self.queue_manager.save_queue_periodically, self.stats_reporter.report_periodically])
+        if self.config.startup == "serial_first":
+            threading.Thread(target=self._start_uplink_in_background, name="uplink", daemon=True).start()
 
         try:
             self.thread_manager.monitor_threads()
@@ -67,9 +141,16 @@ class Application:
 
     def shutdown(self):
         self.logger.info("Initiating graceful shutdown...")
+        self.stopping.set()
         self.thread_manager.stop_all_threads()
         self.queue_manager.save_queue()
-        self.relay_controller.cleanup()
-        self.relay_monitor.cleanup()
-        self.mqtt_handler.stop()
+        for handler in self.serial_handlers:
+            handler.close_journal()
+        if self.relay_controller is not None:
+            self.relay_controller.cleanup()
+        if self.relay_monitor is not None:
+            self.relay_monitor.cleanup()
+        if self.mqtt_handler is not None:
+            self.mqtt_handler.stop()
+        self.queue_manager.close()
         self.logger.info("Graceful shutdown completed")
\ No newline at end of file
@@ -0,0 +1,28 @@
+import logging
+import threading
+import time
+from typing import List, Tuple
+
+
+class BootTimeline:
+    # Milestones of one startup, in ms since the process began importing; logged as one line
+    def __init__(self, started: float | None = None):
+        self.started = time.monotonic() if started is None else started
+        self.marks: List[Tuple[str, float]] = []
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def mark(self, milestone: str) -> float:
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            if any(name == milestone for name, _ in self.marks):
+                return elapsed
+            self.marks.append((milestone, elapsed))
+        return elapsed
+
+    def summary(self) -> str:
+        with self.lock:
+            return "Boot timeline: " + ", ".join(f"{name} {elapsed * 1000:.0f} ms" for name, elapsed in self.marks)
+
+    def log(self) -> None:
+        self.logger.info(self.summary())
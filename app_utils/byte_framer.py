@@ -0,0 +1,48 @@
+from typing import Any, List, Tuple
+
+
+class ByteFramer:
+    def __init__(self, delimiter: bytes = b"\n", encoding: str = "latin-1", max_frame_size: int = 65536):
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.max_frame_size = max_frame_size
+        self.buffer = bytearray()
+        # Bytes already scanned for the delimiter, so a slow trickle is not rescanned from the start
+        self.scan_start = 0
+        # Stamp of the read that delivered the first byte of the pending frame
+        self.frame_stamp: Any = None
+
+    @property
+    def pending(self) -> int:
+        return len(self.buffer)
+
+    def feed(self, data, stamp: Any = None) -> List[Tuple[str, Any]]:
+        buffer = self.buffer
+        if not buffer:
+            self.frame_stamp = stamp
+        buffer += data
+        frames: List[Tuple[str, Any]] = []
+        start = 0
+        end = buffer.find(self.delimiter, self.scan_start)
+        if end >= 0:
+            with memoryview(buffer) as view:
+                while end >= 0:
+                    frames.append((str(view[start:end], self.encoding), self.frame_stamp))
+                    self.frame_stamp = stamp
+                    start = end + len(self.delimiter)
+                    end = buffer.find(self.delimiter, start)
+            del buffer[:start]
+        self.scan_start = max(0, len(buffer) - len(self.delimiter) + 1)
+        if len(buffer) > self.max_frame_size:
+            frames.append(self.flush())
+        return frames
+
+    def flush(self) -> Tuple[str, Any]:
+        frame = self.buffer.decode(self.encoding), self.frame_stamp
+        self.buffer.clear()
+        self.scan_start = 0
+        return frame
+
+    def reset(self) -> None:
+        self.buffer.clear()
+        self.scan_start = 0
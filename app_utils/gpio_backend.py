@@ -0,0 +1,101 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, List
+
+
+class SimulatedGPIO:
+    # The subset of the RPi.GPIO API the gateway uses. Inputs are driven with set_input, and edge
+    # callbacks fire from that call, so relay monitoring can be exercised off the Pi.
+    # Inputs listed in idle_levels start at that level instead of following their pull resistor.
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, idle_levels: Dict[int, int] | None = None):
+        self.lock = threading.Lock()
+        self.mode: int | None = None
+        self.idle_levels = dict(idle_levels or {})
+        self.levels: Dict[int, int] = {}
+        self.callbacks: Dict[int, List[Callable[[int], None]]] = {}
+        self.edges: Dict[int, int] = {}
+
+    def setmode(self, mode: int) -> None:
+        self.mode = mode
+
+    def setwarnings(self, enabled: bool) -> None:
+        pass
+
+    def setup(self, pin: int, direction: int, pull_up_down: int = PUD_OFF, initial: int = LOW) -> None:
+        with self.lock:
+            if direction == self.OUT:
+                self.levels[pin] = initial
+            elif pin in self.idle_levels:
+                self.levels.setdefault(pin, self.idle_levels[pin])
+            elif pin not in self.levels:
+                self.levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+
+    def input(self, pin: int) -> int:
+        with self.lock:
+            return self.levels.get(pin, self.LOW)
+
+    def output(self, pin: int, level: int) -> None:
+        with self.lock:
+            self.levels[pin] = level
+
+    def add_event_detect(self, pin: int, edge: int, callback: Callable[[int], None] | None = None,
+                         bouncetime: int = 0) -> None:
+        with self.lock:
+            self.edges[pin] = edge
+            self.callbacks[pin] = [callback] if callback else []
+
+    def add_event_callback(self, pin: int, callback: Callable[[int], None]) -> None:
+        with self.lock:
+            self.callbacks.setdefault(pin, []).append(callback)
+
+    def remove_event_detect(self, pin: int) -> None:
+        with self.lock:
+            self.edges.pop(pin, None)
+            self.callbacks.pop(pin, None)
+
+    def cleanup(self, pins: Any = None) -> None:
+        with self.lock:
+            for pin in ([pins] if isinstance(pins, int) else pins) if pins is not None else list(self.levels):
+                self.levels.pop(pin, None)
+                self.edges.pop(pin, None)
+                self.callbacks.pop(pin, None)
+
+    def set_input(self, pin: int, level: int) -> None:
+        with self.lock:
+            previous = self.levels.get(pin, self.LOW)
+            self.levels[pin] = level
+            edge = self.edges.get(pin)
+            callbacks = list(self.callbacks.get(pin, ()))
+        if previous == level or edge is None:
+            return
+        if edge == self.BOTH or edge == (self.RISING if level else self.FALLING):
+            for callback in callbacks:
+                callback(pin)
+
+
+def load_gpio(backend: str, idle_levels: Dict[int, int] | None = None) -> Any:
+    # auto: RPi.GPIO, or None when it cannot be loaded; rpi fails without it. Pins are only ever
+    # simulated when the config asks for it, so a missing library can never report a relay state.
+    if backend == "simulated":
+        return SimulatedGPIO(idle_levels)
+    try:
+        import RPi.GPIO as GPIO
+        return GPIO
+    except (ImportError, RuntimeError) as e:
+        if backend == "rpi":
+            raise
+        logging.getLogger(__name__).warning(f"RPi.GPIO not available ({e}). Relay monitoring will be disabled.")
+        return None
@@ -0,0 +1,60 @@
+import threading
+from typing import Dict, Sequence
+
+BUCKETS = 40
+
+
+class LatencyHistogram:
+    # Power-of-two microsecond buckets: bucket i holds samples below 2**i us
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, micros: int) -> None:
+        bucket = min(max(int(micros), 0).bit_length(), BUCKETS - 1)
+        with self.lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total_us += micros
+            self.max_us = max(self.max_us, micros)
+
+    def percentile(self, pct: float) -> int:
+        target = self.count * pct / 100
+        seen = 0
+        for bucket, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if bucket_count and seen >= target:
+                return min(1 << bucket, self.max_us)
+        return self.max_us
+
+    def summary(self) -> str:
+        with self.lock:
+            if not self.count:
+                return "no samples"
+            return (f"n={self.count} avg={self.total_us / self.count / 1000:.1f}ms "
+                    f"p50<={self.percentile(50) / 1000:.1f}ms p95<={self.percentile(95) / 1000:.1f}ms "
+                    f"p99<={self.percentile(99) / 1000:.1f}ms max={self.max_us / 1000:.1f}ms")
+
+
+class StageLatencyTracker:
+    STAGES = ("arrival->parsed", "parsed->queued", "queued->published", "arrival->published")
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in self.STAGES}
+
+    def record(self, trace: Sequence[int] | None, published_ns: int) -> None:
+        if not trace or len(trace) != 3:
+            return
+        arrival_ns, parsed_ns, queued_ns = trace
+        # Traces restored from before a reboot come from another monotonic clock
+        if not arrival_ns <= parsed_ns <= queued_ns <= published_ns:
+            return
+        for stage, start, end in zip(self.STAGES, (arrival_ns, parsed_ns, queued_ns, arrival_ns),
+                                     (parsed_ns, queued_ns, published_ns, published_ns)):
+            self.histograms[stage].record((end - start) // 1000)
+
+    def summary(self) -> str:
+        return "Event latency " + "; ".join(f"{stage}: {histogram.summary()}" for stage, histogram in self.histograms.items())
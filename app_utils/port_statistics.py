@@ -0,0 +1,25 @@
+import time
+
+
+class PortStatistics:
+    def __init__(self, port: str, panel_name: str):
+        self.port = port
+        self.panel_name = panel_name
+        self.bytes_read = 0
+        self.frames = 0
+        self.events = 0
+        self.coalesced = 0
+        self.cpu_time = 0.0
+        self.last_snapshot = (time.monotonic(), 0, 0, 0, 0.0)
+
+    def summary(self) -> str:
+        now = time.monotonic()
+        started, bytes_read, frames, events, cpu_time = self.last_snapshot
+        elapsed = max(now - started, 1e-9)
+        self.last_snapshot = (now, self.bytes_read, self.frames, self.events, self.cpu_time)
+        summary = (f"{self.panel_name} on {self.port}: {(self.events - events) / elapsed:.2f} events/s, "
+                   f"{(self.bytes_read - bytes_read) / elapsed:.0f} B/s, {self.frames - frames} frames, "
+                   f"cpu {(self.cpu_time - cpu_time) / elapsed * 100:.2f}%")
+        if self.coalesced:
+            summary += f", {self.coalesced} repeats coalesced"
+        return summary
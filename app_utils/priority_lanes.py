@@ -0,0 +1,88 @@
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Iterator
+
+DEFAULT_LANE_WEIGHTS = {3: 16, 2: 4, 1: 2, 0: 1}
+
+
+def message_lane(item: Any, default_lane: int) -> int:
+    message = item[1] if isinstance(item, tuple) and len(item) == 2 else None
+    # Message dicts and event records both answer get()
+    # Relay transitions carry an internal lane instead, so the severity published stays the panel's
+    severity = message.get("severity", message.get("_lane")) if hasattr(message, "get") else None
+    return severity if isinstance(severity, int) else default_lane
+
+
+class LaneScheduler:
+    # Smooth weighted round robin: a busy alarm lane gets most turns, but every waiting lane gets some
+    def __init__(self, weights: Dict[int, int] | None = None):
+        self.weights = dict(DEFAULT_LANE_WEIGHTS if weights is None else weights)
+        self.credits: Dict[int, int] = {}
+
+    def weight(self, lane: int) -> int:
+        return max(self.weights.get(lane, 1), 1)
+
+    def pick(self, lanes: Iterable[int]) -> int:
+        best = None
+        total = 0
+        for lane in lanes:
+            weight = self.weight(lane)
+            total += weight
+            credit = self.credits.get(lane, 0) + weight
+            self.credits[lane] = credit
+            if best is None or credit > self.credits[best] or (credit == self.credits[best] and lane > best):
+                best = lane
+        if best is None:
+            raise IndexError("pick from empty lanes")
+        self.credits[best] -= total
+        return best
+
+    def reset(self, lane: int) -> None:
+        # An idle lane must not bank credit while it has nothing to send
+        self.credits.pop(lane, None)
+
+
+class PriorityLanes:
+    # Drop-in for the deque inside queue.Queue: FIFO within a lane, lanes interleaved by weight
+    def __init__(self, weights: Dict[int, int] | None = None, default_lane: int = 1, by_severity: bool = True):
+        self.scheduler = LaneScheduler(weights)
+        self.default_lane = default_lane
+        self.by_severity = by_severity
+        self.lanes: Dict[int, Deque[Any]] = {}
+        self.size = 0
+
+    def lane(self, lane: int) -> Deque[Any]:
+        queue = self.lanes.get(lane)
+        if queue is None:
+            queue = self.lanes[lane] = deque()
+        return queue
+
+    def lane_of(self, item: Any) -> int:
+        return message_lane(item, self.default_lane) if self.by_severity else self.default_lane
+
+    def append(self, item: Any) -> None:
+        self.lane(self.lane_of(item)).append(item)
+        self.size += 1
+
+    def appendleft(self, item: Any) -> None:
+        self.lane(self.lane_of(item)).appendleft(item)
+        self.size += 1
+
+    def popleft(self) -> Any:
+        lane = self.scheduler.pick(lane for lane, queue in self.lanes.items() if queue)
+        queue = self.lanes[lane]
+        item = queue.popleft()
+        self.size -= 1
+        if not queue:
+            self.scheduler.reset(lane)
+        return item
+
+    def clear(self) -> None:
+        self.lanes.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Any]:
+        for lane in sorted(self.lanes, reverse=True):
+            yield from self.lanes[lane]
@@ -1,13 +1,131 @@
 import queue
 import logging
-from typing import Any, List
+from collections import deque
+from typing import Any, Dict, List, Tuple
+from app_utils.priority_lanes import PriorityLanes
+from app_utils.spill_lanes import SpillingLanes
+from app_utils.write_ahead_log import WriteAheadLog
 
 logger = logging.getLogger(__name__)
 
 class SafeQueue(queue.Queue):
-    def __init__(self, maxsize: int = 0):
+    def __init__(self, maxsize: int = 0, priority_lanes: bool = False, lane_weights: Dict[int, int] | None = None, default_lane: int = 1,
+                 spill: Dict[str, Any] | None = None):
+        # Read by _init, which queue.Queue calls from its constructor
+        self.priority_lanes = priority_lanes
+        self.lane_weights = lane_weights
+        self.default_lane = default_lane
+        self.spill = spill
         super().__init__(maxsize)
         self.is_serial_connected = False
+        self.log: WriteAheadLog | None = None
+        # Messages handed out but not acked yet, keyed by id() of the message dict so a re-queued
+        # message keeps its original log record
+        self.in_flight: Dict[int, Tuple[int, Any]] = {}
+
+    def attach_log(self, log: WriteAheadLog) -> None:
+        with self.mutex:
+            self.log = log
+
+    def restore(self, recovered: List[Tuple[int, Any]]) -> None:
+        # Messages read back from the log are already in it, so they skip _put
+        with self.mutex:
+            for sequence, item in recovered:
+                item[1]["_seq"] = sequence
+                self.queue.append(item)
+                self.unfinished_tasks += 1
+            self.not_empty.notify_all()
+
+    def _init(self, maxsize: int) -> None:
+        # Lanes keyed on severity; FIFO within a lane, so alarms overtake a backlog of troubles.
+        # Opt-in: the gateway queue asks for them through queue.priority_lanes, tools keep wire order
+        if self.spill:
+            self.queue = SpillingLanes(weights=self.lane_weights, default_lane=self.default_lane, by_severity=self.priority_lanes,
+                                       on_drop=self._dropped, **self.spill)
+        elif self.priority_lanes:
+            self.queue = PriorityLanes(self.lane_weights, self.default_lane)
+        else:
+            self.queue = deque()
+
+    def _track(self, item: Any) -> None:
+        if self.log is None:
+            return
+        message = item[1]
+        # The log sequence travels inside the message, so it survives being spilled to disk
+        if "_seq" in message:
+            self.in_flight.pop(id(message), None)
+            return
+        try:
+            sequence = self.log.append(item)
+            message["_seq"] = sequence
+        except OSError as e:
+            logger.error(f"Could not write message to the queue log, keeping it in memory only: {e}")
+
+    def _dropped(self, items: List[Any]) -> None:
+        # Messages dropped at the disk cap will never be published; release their log records
+        if self.log is None:
+            return
+        for item in items:
+            sequence = item[1].get("_seq")
+            if sequence is None:
+                continue
+            try:
+                self.log.ack(sequence)
+            except OSError as e:
+                logger.error(f"Could not release dropped message in the queue log: {e}")
+
+    def _put(self, item: Any) -> None:
+        self._track(item)
+        self.queue.append(item)
+
+    def _requeue(self, item: Any) -> None:
+        self._track(item)
+        self.queue.appendleft(item)
+
+    def requeue(self, item: Any) -> None:
+        # A message that could not be published goes back to the front of its lane, ignoring maxsize
+        with self.mutex:
+            self._requeue(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _get(self) -> Any:
+        item = self.queue.popleft()
+        if self.log is not None:
+            sequence = item[1].get("_seq")
+            if sequence is not None:
+                self.in_flight[id(item[1])] = (sequence, item)
+        return item
+
+    def wait_not_empty(self, timeout: float | None = None) -> bool:
+        # Blocks until a put, requeue or wake(); True when there is something to get
+        with self.not_empty:
+            if not self._qsize():
+                self.not_empty.wait(timeout)
+            return bool(self._qsize())
+
+    def wake(self) -> None:
+        with self.not_empty:
+            self.not_empty.notify_all()
+
+    def get_batch(self, count: int) -> List[Any]:
+        # Non-blocking: whatever is queued, up to count messages
+        with self.not_empty:
+            items = [self._get() for _ in range(min(count, self._qsize()))]
+            if items:
+                self.not_full.notify(len(items))
+            return items
+
+    def ack(self, message: Dict[str, Any]) -> None:
+        if self.log is None:
+            return
+        with self.mutex:
+            in_flight = self.in_flight.pop(id(message), None)
+        if in_flight is not None:
+            try:
+                self.log.ack(in_flight[0])
+            except OSError as e:
+                logger.error(f"Could not record delivery in the queue log: {e}")
 
     def save_to_file(self, file_path: str) -> None:
         from app_utils.file_operations import save_to_file
@@ -26,4 +144,4 @@ class SafeQueue(queue.Queue):
             except EOFError:
                 logger.debug("No pending events or reports")
             except Exception as e:
-                logger.error(f"Unknown error loading queue: {e}")
\ No newline at end of file
+                logger.error(f"Unknown error loading queue: {e}")
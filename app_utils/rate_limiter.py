@@ -0,0 +1,46 @@
+import threading
+import time
+from typing import Callable, Iterable, List, Tuple
+
+
+class GcraLimit:
+    # Generic cell rate algorithm: one theoretical arrival time instead of a timestamp per request.
+    # A full burst of `count` is allowed, after that one request every period / count seconds
+    __slots__ = ("count", "period", "interval", "tat")
+
+    def __init__(self, count: int, period: float):
+        self.count = count
+        self.period = period
+        self.interval = period / count
+        self.tat = 0.0
+
+    def wait_time(self, now: float, cost: int) -> float:
+        allowed_at = max(self.tat, now) + cost * self.interval - self.period
+        return max(allowed_at - now, 0.0)
+
+    def consume(self, now: float, cost: int) -> None:
+        self.tat = max(self.tat, now) + cost * self.interval
+
+
+class RateLimiter:
+    def __init__(self, limits: Iterable[Tuple[int, float]], clock: Callable[[], float] = time.monotonic):
+        self.limits: List[GcraLimit] = [GcraLimit(count, period) for count, period in limits if count > 0 and period > 0]
+        self.clock = clock
+        self.lock = threading.Lock()
+
+    def wait_time(self, cost: int = 1) -> float:
+        # Seconds until cost more sends fit every limit; 0 means now
+        with self.lock:
+            now = self.clock()
+            return max((limit.wait_time(now, cost) for limit in self.limits), default=0.0)
+
+    def reserve(self, cost: int = 1) -> float:
+        # Takes the slots and returns 0 when they fit, otherwise takes nothing and returns the wait until they would
+        with self.lock:
+            now = self.clock()
+            wait = max((limit.wait_time(now, cost) for limit in self.limits), default=0.0)
+            if wait > 0:
+                return wait
+            for limit in self.limits:
+                limit.consume(now, cost)
+            return 0.0
@@ -0,0 +1,146 @@
+import glob
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Iterator, List, Tuple
+
+SEGMENT_MAGIC = b"SJNL"
+SEGMENT_VERSION = 1
+# magic, version, generation
+SEGMENT_HEADER = struct.Struct("<4sHxxQ")
+RECORD_MAGIC = 0x52454331
+# magic, length, wall clock in epoch microseconds, crc32 of the payload
+RECORD_HEADER = struct.Struct("<IIQI")
+END_MARKER = b"\x00" * 4
+
+
+def journal_directory(base_directory: str, port: str) -> str:
+    return os.path.join(base_directory, port.strip("/").replace("/", "_") or "serial")
+
+
+class SerialJournal:
+    # Fixed-size ring of memory-mapped segment files holding raw serial reads
+    def __init__(self, directory: str, segment_size: int = 1048576, segments: int = 8, flush_interval: float = 10):
+        if segment_size < SEGMENT_HEADER.size + RECORD_HEADER.size + 64:
+            raise ValueError(f"Journal segment size {segment_size} is too small")
+        if segments < 2:
+            raise ValueError("The journal needs at least two segments")
+        self.directory = directory
+        self.segment_size = segment_size
+        self.segment_count = segments
+        self.flush_interval = flush_interval
+        self.logger = logging.getLogger(__name__)
+        self.files = []
+        self.maps: List[mmap.mmap] = []
+        self.current = 0
+        self.generation = 0
+        self.offset = SEGMENT_HEADER.size
+        self.last_flush = time.monotonic()
+        self.open()
+
+    def segment_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"segment-{index:03d}.jnl")
+
+    def open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        newest_index, newest_generation = -1, 0
+        for index in range(self.segment_count):
+            path = self.segment_path(index)
+            handle = open(path, "r+b" if os.path.exists(path) else "w+b")
+            if os.fstat(handle.fileno()).st_size != self.segment_size:
+                # Resized journals start over: a truncated segment cannot be trusted
+                handle.truncate(0)
+                handle.truncate(self.segment_size)
+                if hasattr(os, "posix_fallocate"):
+                    # Reserve the blocks now so a full card fails here instead of inside a mapped write
+                    os.posix_fallocate(handle.fileno(), 0, self.segment_size)
+            segment_map = mmap.mmap(handle.fileno(), self.segment_size)
+            self.files.append(handle)
+            self.maps.append(segment_map)
+            magic, version, generation = SEGMENT_HEADER.unpack_from(segment_map, 0)
+            if magic == SEGMENT_MAGIC and version == SEGMENT_VERSION and generation > newest_generation:
+                newest_index, newest_generation = index, generation
+        # Never append to a segment from a previous run; its tail may be torn
+        self.generation = newest_generation
+        self.current = newest_index
+        self.rotate()
+
+    def rotate(self) -> None:
+        if self.maps and self.current >= 0:
+            self.maps[self.current].flush()
+        self.current = (self.current + 1) % self.segment_count
+        self.generation += 1
+        segment_map = self.maps[self.current]
+        SEGMENT_HEADER.pack_into(segment_map, 0, SEGMENT_MAGIC, SEGMENT_VERSION, self.generation)
+        segment_map[SEGMENT_HEADER.size:SEGMENT_HEADER.size + len(END_MARKER)] = END_MARKER
+        self.offset = SEGMENT_HEADER.size
+
+    def append(self, data, wall_us: int) -> None:
+        max_payload = self.segment_size - SEGMENT_HEADER.size - RECORD_HEADER.size - len(END_MARKER)
+        data = memoryview(data)
+        while data:
+            chunk = data[:max_payload]
+            data = data[max_payload:]
+            end = self.offset + RECORD_HEADER.size + len(chunk)
+            if end + len(END_MARKER) > self.segment_size:
+                self.rotate()
+                end = self.offset + RECORD_HEADER.size + len(chunk)
+            segment_map = self.maps[self.current]
+            RECORD_HEADER.pack_into(segment_map, self.offset, RECORD_MAGIC, len(chunk), wall_us, zlib.crc32(chunk))
+            segment_map[self.offset + RECORD_HEADER.size:end] = chunk
+            segment_map[end:end + len(END_MARKER)] = END_MARKER
+            self.offset = end
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self.maps[self.current].flush()
+        self.last_flush = time.monotonic()
+
+    def close(self) -> None:
+        for segment_map in self.maps:
+            try:
+                segment_map.flush()
+                segment_map.close()
+            except (ValueError, OSError) as e:
+                self.logger.error(f"Error closing journal segment: {e}")
+        for handle in self.files:
+            handle.close()
+        self.maps = []
+        self.files = []
+
+
+def read_segment(path: str) -> Tuple[int, List[Tuple[int, bytes]]]:
+    with open(path, "rb") as handle:
+        data = handle.read()
+    if len(data) < SEGMENT_HEADER.size:
+        return 0, []
+    magic, version, generation = SEGMENT_HEADER.unpack_from(data, 0)
+    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+        return 0, []
+    records: List[Tuple[int, bytes]] = []
+    offset = SEGMENT_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        record_magic, length, wall_us, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        # Anything after a torn or unwritten record belongs to an older generation
+        if record_magic != RECORD_MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+            break
+        records.append((wall_us, payload))
+        offset = start + length
+    return generation, records
+
+
+def read_journal(directory: str, since_us: int | None = None, until_us: int | None = None) -> Iterator[Tuple[int, bytes]]:
+    segments = [read_segment(path) for path in glob.glob(os.path.join(directory, "segment-*.jnl"))]
+    for _, records in sorted(segment for segment in segments if segment[0]):
+        for wall_us, payload in records:
+            if since_us is not None and wall_us < since_us:
+                continue
+            if until_us is not None and wall_us > until_us:
+                continue
+            yield wall_us, payload
@@ -0,0 +1,173 @@
+import logging
+import os
+import pickle
+import zlib
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterator, List
+
+from app_utils.priority_lanes import PriorityLanes
+
+logger = logging.getLogger(__name__)
+
+
+class SpillSegment:
+    __slots__ = ("path", "count", "size")
+
+    def __init__(self, path: str, count: int, size: int):
+        self.path = path
+        self.count = count
+        self.size = size
+
+
+class SpillLane:
+    # hot: in memory, oldest first; segments: compressed batches on disk; tail: newest, waiting to fill a segment
+    def __init__(self, owner: "SpillingLanes", lane: int):
+        self.owner = owner
+        self.lane = lane
+        self.hot: Deque[Any] = deque()
+        self.segments: Deque[SpillSegment] = deque()
+        self.tail: List[Any] = []
+        self.spilled = 0
+
+    def append(self, item: Any) -> None:
+        owner = self.owner
+        if not self.segments and not self.tail and owner.hot_items < owner.memory_items:
+            self.hot.append(item)
+            owner.hot_items += 1
+            return
+        # Once anything is on disk newer items must follow it there to keep the lane in order
+        self.tail.append(item)
+        if len(self.tail) >= owner.segment_items:
+            owner.spill(self)
+
+    def appendleft(self, item: Any) -> None:
+        self.hot.appendleft(item)
+        self.owner.hot_items += 1
+
+    def popleft(self) -> Any:
+        while not self.hot and (self.segments or self.tail):
+            self.owner.load(self)
+        if not self.hot:
+            raise IndexError("pop from an empty lane")
+        self.owner.hot_items -= 1
+        return self.hot.popleft()
+
+    def __len__(self) -> int:
+        return len(self.hot) + self.spilled + len(self.tail)
+
+    def __bool__(self) -> bool:
+        return bool(self.hot or self.segments or self.tail)
+
+    def __iter__(self) -> Iterator[Any]:
+        yield from self.hot
+        for segment in self.segments:
+            yield from self.owner.read(segment)
+        yield from self.tail
+
+
+class SpillingLanes(PriorityLanes):
+    # PriorityLanes with a cap on the messages kept in RAM; the overflow goes to compressed segment files
+    def __init__(self, directory: str, memory_items: int, segment_items: int = 1000, disk_bytes: int = 268435456,
+                 overflow: str = "drop_oldest", weights: Dict[int, int] | None = None, default_lane: int = 1,
+                 by_severity: bool = True, encode: Callable[[Any], bytes] = pickle.dumps,
+                 decode: Callable[[bytes], Any] = pickle.loads, on_drop: Callable[[List[Any]], None] | None = None):
+        super().__init__(weights, default_lane, by_severity)
+        self.directory = directory
+        self.memory_items = memory_items
+        self.segment_items = max(segment_items, 1)
+        self.disk_bytes = disk_bytes
+        self.overflow = overflow
+        self.encode = encode
+        self.decode = decode
+        self.on_drop = on_drop
+        self.hot_items = 0
+        self.disk_used = 0
+        self.segment_counter = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+        # Spilled segments only relieve memory; the queue backend owns durability
+        for name in os.listdir(directory):
+            if name.endswith(".spill"):
+                os.remove(os.path.join(directory, name))
+
+    def lane(self, lane: int) -> SpillLane:
+        queue = self.lanes.get(lane)
+        if queue is None:
+            queue = self.lanes[lane] = SpillLane(self, lane)
+        return queue
+
+    def spill(self, lane: SpillLane) -> None:
+        data = zlib.compress(self.encode(lane.tail), 1)
+        while self.disk_used + len(data) > self.disk_bytes:
+            if self.overflow == "drop_newest" or not self.drop_oldest_segment():
+                self.discard(lane.tail, f"newest messages of lane {lane.lane}")
+                self.size -= len(lane.tail)
+                lane.tail = []
+                return
+        self.segment_counter += 1
+        path = os.path.join(self.directory, f"lane{lane.lane}-{self.segment_counter:012d}.spill")
+        with open(path, "wb") as segment_file:
+            segment_file.write(data)
+        lane.segments.append(SpillSegment(path, len(lane.tail), len(data)))
+        lane.spilled += len(lane.tail)
+        self.disk_used += len(data)
+        lane.tail = []
+
+    def drop_oldest_segment(self) -> bool:
+        # Oldest data from the least severe lane goes first
+        for lane_id in sorted(self.lanes):
+            lane = self.lanes[lane_id]
+            if lane.segments:
+                segment = lane.segments.popleft()
+                try:
+                    items = self.read(segment) if self.on_drop else []
+                except Exception as e:
+                    logger.error(f"Could not read dropped spill segment {segment.path}: {e}")
+                    items = []
+                self.remove(segment)
+                lane.spilled -= segment.count
+                self.size -= segment.count
+                self.discard(items, f"oldest spilled messages of lane {lane_id}", segment.count)
+                return True
+        return False
+
+    def discard(self, items: List[Any], reason: str, count: int | None = None) -> None:
+        count = len(items) if count is None else count
+        self.dropped += count
+        logger.error(f"Queue disk cap of {self.disk_bytes} bytes reached: dropped {count} messages ({reason})")
+        if self.on_drop and items:
+            self.on_drop(items)
+
+    def read(self, segment: SpillSegment) -> List[Any]:
+        with open(segment.path, "rb") as segment_file:
+            return self.decode(zlib.decompress(segment_file.read()))
+
+    def remove(self, segment: SpillSegment) -> None:
+        self.disk_used -= segment.size
+        try:
+            os.remove(segment.path)
+        except OSError as e:
+            logger.error(f"Could not remove spill segment {segment.path}: {e}")
+
+    def load(self, lane: SpillLane) -> None:
+        if lane.segments:
+            segment = lane.segments.popleft()
+            try:
+                items = self.read(segment)
+            except Exception as e:
+                logger.error(f"Lost {segment.count} spilled messages, could not read {segment.path}: {e}")
+                items = []
+            self.remove(segment)
+            lane.spilled -= segment.count
+            self.size -= segment.count - len(items)
+        else:
+            items, lane.tail = lane.tail, []
+        lane.hot.extend(items)
+        self.hot_items += len(items)
+
+    def clear(self) -> None:
+        for lane in self.lanes.values():
+            for segment in lane.segments:
+                self.remove(segment)
+        super().clear()
+        self.hot_items = 0
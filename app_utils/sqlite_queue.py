@@ -0,0 +1,142 @@
+import logging
+import os
+import pickle
+import queue
+import sqlite3
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple
+from app_utils.priority_lanes import LaneScheduler, message_lane
+from app_utils.queue_operations import SafeQueue
+
+PENDING = 0
+IN_FLIGHT = 1
+SYNCHRONOUS = {"always": "FULL", "interval": "NORMAL", "never": "OFF"}
+
+logger = logging.getLogger(__name__)
+
+
+class SqliteQueue(SafeQueue):
+    # Same put/get/ack interface as SafeQueue, with pending messages kept in SQLite instead of RAM
+    def __init__(self, path: str, maxsize: int = 0, fsync: str = "always", prefetch: int = 64,
+                 encode: Callable[[Any], bytes] = pickle.dumps, decode: Callable[[bytes], Any] = pickle.loads,
+                 priority_lanes: bool = False, lane_weights: Dict[int, int] | None = None, default_lane: int = 1):
+        self.path = path
+        self.fsync = fsync
+        self.prefetch = prefetch
+        self.encode = encode
+        self.decode = decode
+        super().__init__(maxsize, priority_lanes, lane_weights, default_lane)
+
+    def _init(self, maxsize: int) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Every access happens under the queue mutex, so one shared connection is safe
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(f"PRAGMA synchronous={SYNCHRONOUS[self.fsync]}")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS messages ("
+                                "seq INTEGER PRIMARY KEY AUTOINCREMENT, state INTEGER NOT NULL DEFAULT 0, payload BLOB NOT NULL)")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(messages)")]
+        if "lane" not in columns:
+            self.connection.execute(f"ALTER TABLE messages ADD COLUMN lane INTEGER NOT NULL DEFAULT {int(self.default_lane)}")
+        self.connection.execute("DROP INDEX IF EXISTS messages_state_seq")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS messages_state_lane_seq ON messages (state, lane, seq)")
+        # Messages handed out before a restart were never acked
+        self.connection.execute("UPDATE messages SET state = ? WHERE state = ?", (PENDING, IN_FLIGHT))
+        self.pending: Dict[int, int] = dict(self.connection.execute(
+            "SELECT lane, COUNT(*) FROM messages WHERE state = ? GROUP BY lane", (PENDING,)).fetchall())
+        self.buffers: Dict[int, Deque[Tuple[int, Any]]] = {}
+        self.scheduler = LaneScheduler(self.lane_weights)
+
+    def lane_of(self, item: Any) -> int:
+        return message_lane(item, self.default_lane) if self.priority_lanes else self.default_lane
+
+    def _qsize(self) -> int:
+        return sum(self.pending.values()) + sum(len(buffer) for buffer in self.buffers.values())
+
+    def _put(self, item: Any) -> None:
+        lane = self.lane_of(item)
+        in_flight = self.in_flight.pop(id(item[1]), None)
+        if in_flight is not None:
+            buffer = self.buffers.get(lane)
+            if buffer:
+                # Prefetched rows of the lane are newer and are served before the table, so the message goes back
+                # ahead of them; its row stays in flight like theirs
+                buffer.appendleft(in_flight)
+                return
+            # A message that failed to publish goes back in its original position
+            self.connection.execute("UPDATE messages SET state = ? WHERE seq = ?", (PENDING, in_flight[0]))
+        else:
+            self.connection.execute("INSERT INTO messages (lane, payload) VALUES (?, ?)", (lane, self.encode(item)))
+        self.pending[lane] = self.pending.get(lane, 0) + 1
+
+    def _requeue(self, item: Any) -> None:
+        self._put(item)
+
+    def fetch(self, lane: int, count: int) -> List[Tuple[int, Any]]:
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute("SELECT seq, payload FROM messages WHERE state = ? AND lane = ? ORDER BY seq LIMIT ?",
+                                      (PENDING, lane, count)).fetchall()
+            connection.executemany("UPDATE messages SET state = ? WHERE seq = ?", [(IN_FLIGHT, seq) for seq, _ in rows])
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        self.pending[lane] -= len(rows)
+        fetched = []
+        for seq, payload in rows:
+            try:
+                fetched.append((seq, self.decode(payload)))
+            except Exception as e:
+                logger.error(f"Dropping undecodable queue row {seq}: {e}")
+                connection.execute("DELETE FROM messages WHERE seq = ?", (seq,))
+        return fetched
+
+    def next_row(self, fetch_count: int) -> Tuple[int, Any]:
+        while True:
+            lanes = [lane for lane in set(self.pending) | set(self.buffers) if self.pending.get(lane) or self.buffers.get(lane)]
+            if not lanes:
+                # Only undecodable rows were left
+                raise queue.Empty
+            lane = self.scheduler.pick(lanes)
+            buffer = self.buffers.setdefault(lane, deque())
+            if not buffer:
+                buffer.extend(self.fetch(lane, fetch_count))
+            if buffer:
+                row = buffer.popleft()
+                if not buffer and not self.pending.get(lane):
+                    self.scheduler.reset(lane)
+                return row
+
+    def _get(self) -> Any:
+        seq, item = self.next_row(self.prefetch)
+        self.in_flight[id(item[1])] = (seq, item)
+        return item
+
+    def get_batch(self, count: int) -> List[Any]:
+        # Up to count messages, moved to in-flight one transaction per lane; each still needs its own ack
+        with self.not_empty:
+            items = []
+            while len(items) < count and self._qsize():
+                try:
+                    seq, item = self.next_row(max(self.prefetch, count - len(items)))
+                except queue.Empty:
+                    break
+                self.in_flight[id(item[1])] = (seq, item)
+                items.append(item)
+            if items:
+                self.not_full.notify(len(items))
+            return items
+
+    def ack(self, message: Dict[str, Any]) -> None:
+        with self.mutex:
+            in_flight = self.in_flight.pop(id(message), None)
+            if in_flight is not None:
+                self.connection.execute("DELETE FROM messages WHERE seq = ?", (in_flight[0],))
+
+    def close(self) -> None:
+        with self.mutex:
+            self.connection.close()
@@ -0,0 +1,20 @@
+import time
+from datetime import datetime
+from typing import Tuple
+
+SBC_DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+# (wall clock in epoch microseconds, monotonic nanoseconds) taken together when bytes are read
+ArrivalStamp = Tuple[int, int]
+
+
+def arrival_stamp() -> ArrivalStamp:
+    return time.time_ns() // 1000, time.monotonic_ns()
+
+
+def format_sbc_date(epoch_us: int | float | str) -> str:
+    if isinstance(epoch_us, str):
+        # Messages persisted by older versions already carry the formatted date
+        return epoch_us
+    epoch_us = int(epoch_us)
+    return datetime.fromtimestamp(epoch_us // 1_000_000).replace(microsecond=epoch_us % 1_000_000).strftime(SBC_DATE_FORMAT)
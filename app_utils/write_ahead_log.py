@@ -0,0 +1,224 @@
+import bisect
+import glob
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+from array import array
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Tuple
+
+ENQUEUE = 1
+ACK = 2
+# record type, payload length, sequence, crc32 of type + sequence + payload
+RECORD_HEADER = struct.Struct("<BIQI")
+RECORD_KEY = struct.Struct("<BQ")
+SEGMENT_PATTERN = "wal-*.log"
+
+
+def record_crc(record_type: int, sequence: int, payload: bytes) -> int:
+    return zlib.crc32(payload, zlib.crc32(RECORD_KEY.pack(record_type, sequence)))
+
+
+class WalSegment:
+    __slots__ = ("first_sequence", "path", "unacked")
+
+    def __init__(self, first_sequence: int, path: str, unacked: int = 0):
+        self.first_sequence = first_sequence
+        self.path = path
+        self.unacked = unacked
+
+
+class WriteAheadLog:
+    def __init__(self, directory: str, segment_size: int = 4194304, fsync: str = "always", fsync_interval: float = 1.0,
+                 encode: Callable[[Any], bytes] = pickle.dumps, decode: Callable[[bytes], Any] = pickle.loads):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.encode = encode
+        self.decode = decode
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.segments: List[WalSegment] = []
+        # first_sequence of each entry in segments, kept alongside it so segment_for can bisect without rebuilding it
+        self.segment_starts: List[int] = []
+        self.fd: int | None = None
+        self.active_size = 0
+        self.next_sequence = 1
+        self.last_sync = time.monotonic()
+        self.dirty = False
+        # Pending records found by scan() that have not been handed to the queue yet
+        self.unrestored: Deque[Tuple[str, array, array, array]] = deque()
+        self.unrestored_position = 0
+        self.unrestored_count = 0
+
+    def segment_path(self, first_sequence: int) -> str:
+        return os.path.join(self.directory, f"wal-{first_sequence:020d}.log")
+
+    def scan_segment(self, path: str) -> List[Tuple[int, int, int, int]]:
+        # (record type, sequence, payload offset, payload length); payloads are checked but not decoded
+        if os.path.getsize(path) == 0:
+            return []
+        records = []
+        with open(path, "rb") as segment_file, mmap.mmap(segment_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(data):
+                record_type, length, sequence, crc = RECORD_HEADER.unpack_from(data, offset)
+                start = offset + RECORD_HEADER.size
+                if record_type not in (ENQUEUE, ACK) or start + length > len(data) or \
+                        record_crc(record_type, sequence, data[start:start + length]) != crc:
+                    # A torn tail from a power cut; everything before it is intact
+                    self.logger.warning(f"Discarding {len(data) - offset} bytes after a damaged record in {path}")
+                    break
+                records.append((record_type, sequence, start, length))
+                offset = start + length
+        return records
+
+    def scan(self) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        paths = sorted(glob.glob(os.path.join(self.directory, SEGMENT_PATTERN)))
+        pending: Dict[int, Tuple[int, int, int]] = {}
+        for index, path in enumerate(paths):
+            # A segment's name is the first sequence it may hold, even when it holds no enqueue at all
+            self.next_sequence = max(self.next_sequence, int(os.path.basename(path)[4:-4]))
+            for record_type, sequence, offset, length in self.scan_segment(path):
+                self.next_sequence = max(self.next_sequence, sequence + 1)
+                if record_type == ENQUEUE:
+                    pending[sequence] = (index, offset, length)
+                else:
+                    pending.pop(sequence, None)
+
+        # Compact per-segment index of what is still pending, so a large backlog costs bytes instead of objects
+        unacked = [0] * len(paths)
+        index_by_path = [(array("Q"), array("Q"), array("I")) for _ in paths]
+        for sequence in sorted(pending):
+            index, offset, length = pending[sequence]
+            unacked[index] += 1
+            sequences, offsets, lengths = index_by_path[index]
+            sequences.append(sequence)
+            offsets.append(offset)
+            lengths.append(length)
+        for index, path in enumerate(paths):
+            first_sequence = int(os.path.basename(path)[4:-4])
+            self.segments.append(WalSegment(first_sequence, path, unacked[index]))
+            self.segment_starts.append(first_sequence)
+            if unacked[index]:
+                self.unrestored.append((path, *index_by_path[index]))
+        self.unrestored_count = len(pending)
+        self.open_segment()
+        self.compact()
+        return self.unrestored_count
+
+    def restore_chunk(self, count: int) -> List[Tuple[int, Any]]:
+        # Decodes the next count pending records in log order; segments must not be compacted before they are read
+        items: List[Tuple[int, Any]] = []
+        while self.unrestored and len(items) < count:
+            path, sequences, offsets, lengths = self.unrestored[0]
+            take = min(count - len(items), len(sequences) - self.unrestored_position)
+            with open(path, "rb") as segment_file:
+                for position in range(self.unrestored_position, self.unrestored_position + take):
+                    segment_file.seek(offsets[position])
+                    sequence = sequences[position]
+                    try:
+                        items.append((sequence, self.decode(segment_file.read(lengths[position]))))
+                    except Exception as e:
+                        self.logger.error(f"Dropping undecodable queue record {sequence}: {e}")
+                        self.ack(sequence)
+            self.unrestored_position += take
+            self.unrestored_count -= take
+            if self.unrestored_position >= len(sequences):
+                self.unrestored.popleft()
+                self.unrestored_position = 0
+        return items
+
+    def recover(self) -> List[Tuple[int, Any]]:
+        self.scan()
+        return self.restore_chunk(self.unrestored_count)
+
+    def open_segment(self) -> None:
+        if self.fd is not None:
+            self.sync_fd()
+            os.close(self.fd)
+        path = self.segment_path(self.next_sequence)
+        if any(segment.path == path for segment in self.segments):
+            # The newest segment before a restart was empty or held only acks. Appending to it would leave two
+            # entries for one file, and compacting the stale one would unlink the active segment; skip a sequence
+            # so the active segment gets a name of its own and the old one is compacted normally.
+            self.next_sequence += 1
+            path = self.segment_path(self.next_sequence)
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.active_size = 0
+        self.segments.append(WalSegment(self.next_sequence, path))
+        self.segment_starts.append(self.next_sequence)
+        if self.fsync != "never":
+            directory_fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+
+    def segment_for(self, sequence: int) -> WalSegment:
+        index = bisect.bisect_right(self.segment_starts, sequence) - 1
+        return self.segments[max(index, 0)]
+
+    def write_record(self, record_type: int, sequence: int, payload: bytes) -> None:
+        if self.fd is None:
+            raise OSError("The queue log is closed")
+        header = RECORD_HEADER.pack(record_type, len(payload), sequence, record_crc(record_type, sequence, payload))
+        os.write(self.fd, header + payload)
+        self.active_size += RECORD_HEADER.size + len(payload)
+        self.dirty = True
+
+    def append(self, item: Any) -> int:
+        payload = self.encode(item)
+        with self.lock:
+            if self.active_size >= self.segment_size:
+                self.open_segment()
+            sequence = self.next_sequence
+            self.next_sequence += 1
+            self.write_record(ENQUEUE, sequence, payload)
+            self.segments[-1].unacked += 1
+            if self.fsync == "always" or (self.fsync == "interval" and time.monotonic() - self.last_sync >= self.fsync_interval):
+                self.sync_fd()
+        return sequence
+
+    def ack(self, sequence: int) -> None:
+        with self.lock:
+            if self.fd is None:
+                return
+            # Acks are not synced: losing one only means a duplicate publish after a crash
+            self.write_record(ACK, sequence, b"")
+            self.segment_for(sequence).unacked -= 1
+            self.compact()
+
+    def compact(self) -> None:
+        # Oldest first only, so acks stored in a deleted segment never refer to live records
+        while len(self.segments) > 1 and self.segments[0].unacked <= 0 and self.segments[0].path != self.segments[-1].path:
+            segment = self.segments.pop(0)
+            self.segment_starts.pop(0)
+            try:
+                os.remove(segment.path)
+            except OSError as e:
+                self.logger.error(f"Could not remove queue segment {segment.path}: {e}")
+
+    def sync_fd(self) -> None:
+        if self.fd is not None and self.dirty:
+            os.fsync(self.fd)
+            self.dirty = False
+        self.last_sync = time.monotonic()
+
+    def sync(self) -> None:
+        with self.lock:
+            self.sync_fd()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.fd is not None:
+                self.sync_fd()
+                os.close(self.fd)
+                self.fd = None
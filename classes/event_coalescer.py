@@ -0,0 +1,75 @@
+import logging
+import time
+from typing import Callable, Dict, Tuple
+from classes.event_record import EventRecord
+
+
+class Burst:
+    __slots__ = ("opened", "repeats", "first_date", "last")
+
+    def __init__(self, opened: float):
+        self.opened = opened
+        self.repeats = 0
+        self.first_date = 0
+        self.last: EventRecord | None = None
+
+
+class EventCoalescer:
+    # The first occurrence of an event is published at once; identical events (same ID and description)
+    # within the next window seconds are held back and published as one message with a repeat count
+    def __init__(self, publish: Callable[[EventRecord, Tuple[int, int] | None], None], window: float = 10.0,
+                 pass_severity: int = 3, max_bursts: int = 1024):
+        self.publish = publish
+        self.window = window
+        self.pass_severity = pass_severity
+        self.max_bursts = max_bursts
+        # Insertion order is window order, so the first burst is always the next one to close
+        self.bursts: Dict[Tuple[str, str], Burst] = {}
+        self.coalesced = 0
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, record: EventRecord, trace: Tuple[int, int] | None = None) -> None:
+        now = time.monotonic()
+        self.flush(now)
+        if record.severity >= self.pass_severity:
+            self.publish(record, trace)
+            return
+        key = (record.event, record.description)
+        burst = self.bursts.get(key)
+        if burst is None:
+            if len(self.bursts) >= self.max_bursts:
+                self.close(next(iter(self.bursts)), now, reopen=False)
+            self.bursts[key] = Burst(now)
+            self.publish(record, trace)
+            return
+        if not burst.repeats:
+            burst.first_date = record.sbc_date
+        burst.repeats += 1
+        burst.last = record
+        self.coalesced += 1
+
+    def flush(self, now: float | None = None) -> None:
+        now = time.monotonic() if now is None else now
+        while self.bursts:
+            key, burst = next(iter(self.bursts.items()))
+            if now - burst.opened < self.window:
+                break
+            self.close(key, now, reopen=True)
+
+    def flush_all(self) -> None:
+        for key in list(self.bursts):
+            self.close(key, time.monotonic(), reopen=False)
+
+    def close(self, key: Tuple[str, str], now: float, reopen: bool) -> None:
+        burst = self.bursts.pop(key)
+        if not burst.repeats:
+            return
+        record = burst.last
+        record.repeats = burst.repeats
+        record.first_date = burst.first_date
+        self.logger.debug(f"Coalesced {burst.repeats} repeats of {record.event}")
+        # No trace: the hold-back is deliberate and would only skew the latency percentiles
+        self.publish(record, None)
+        if reopen:
+            # A fault loop that keeps going produces one summary per window, not one message plus one summary
+            self.bursts[key] = Burst(now)
@@ -0,0 +1,190 @@
+import pickle
+import struct
+import sys
+from typing import Any, Dict, Iterator, List, Tuple
+
+from classes.enums import PublishType
+
+# Message keys and the slot each one is stored in
+FIELDS = {"event": "event", "description": "description", "severity": "severity", "SBC_date": "sbc_date",
+          "FACP_date": "facp_date", "source": "source", "repeat_count": "repeats", "first_SBC_date": "first_date",
+          "_trace": "trace", "_seq": "seq"}
+PAYLOAD_KEYS = ("event", "description", "severity", "SBC_date", "FACP_date")
+OPTIONAL_KEYS = ("source", "repeat_count", "first_SBC_date", "_trace", "_seq")
+
+# Encoded records and batches start with a tag byte; anything else is a pickle (protocol 2+ starts with 0x80)
+RECORD_TAG = 0xE5
+BATCH_TAG = 0xE6
+# tag, publish type, severity, flags, SBC_date, then the lengths of event, description, FACP_date and source
+RECORD_HEADER = struct.Struct("<BBbBqHHHH")
+TRACE = struct.Struct("<QQQ")
+SEQUENCE = struct.Struct("<Q")
+REPEATS = struct.Struct("<Iq")
+COUNT = struct.Struct("<I")
+HAS_SOURCE = 1
+HAS_TRACE = 2
+HAS_SEQ = 4
+HAS_REPEATS = 8
+PUBLISH_TYPES = {publish_type.value: publish_type for publish_type in PublishType}
+
+
+class EventRecord:
+    # A parsed panel event. Reads and writes like the message dict it replaces, with the event
+    # and source strings interned so a backlog of the same few events shares them.
+    # repeats and first_date are only set on a message that stands for a coalesced burst
+    __slots__ = ("event", "description", "severity", "sbc_date", "facp_date", "source", "trace", "seq", "repeats", "first_date")
+
+    def __init__(self, event: str, description: str, severity: int, sbc_date: int, facp_date: str,
+                 source: str | None = None, trace: Tuple[int, ...] | None = None, seq: int | None = None,
+                 repeats: int | None = None, first_date: int | None = None):
+        self.event = sys.intern(event)
+        self.description = description
+        self.severity = severity
+        self.sbc_date = sbc_date
+        self.facp_date = facp_date
+        self.source = sys.intern(source) if source is not None else None
+        self.trace = trace
+        self.seq = seq
+        self.repeats = repeats
+        self.first_date = first_date
+
+    def keys(self) -> Iterator[str]:
+        yield from PAYLOAD_KEYS
+        for key in OPTIONAL_KEYS:
+            if getattr(self, FIELDS[key]) is not None:
+                yield key
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        for key in self.keys():
+            yield key, getattr(self, FIELDS[key])
+
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, FIELDS[key])
+        if value is None and key in OPTIONAL_KEYS:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        setattr(self, FIELDS[key], value)
+
+    def __contains__(self, key: object) -> bool:
+        return key in FIELDS and (key not in OPTIONAL_KEYS or getattr(self, FIELDS[key]) is not None)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, FIELDS[key], None) if key in FIELDS else None
+        return default if value is None else value
+
+    def copy(self) -> "EventRecord":
+        return EventRecord(self.event, self.description, self.severity, self.sbc_date, self.facp_date,
+                           self.source, self.trace, self.seq, self.repeats, self.first_date)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Much faster for pickle snapshots than the generic slots state
+        return EventRecord, (self.event, self.description, self.severity, self.sbc_date, self.facp_date,
+                             self.source, self.trace, self.seq, self.repeats, self.first_date)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, EventRecord):
+            return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+
+def encodable(item: Any) -> bool:
+    if not (isinstance(item, tuple) and len(item) == 2 and isinstance(item[1], EventRecord)):
+        return False
+    record = item[1]
+    # Anything outside the compact layout, e.g. a SBC_date already formatted as text, is pickled instead
+    return (isinstance(record.sbc_date, int) and (record.first_date is None or isinstance(record.first_date, int)) and isinstance(record.severity, int) and -128 <= record.severity < 128
+            and isinstance(record.event, str) and isinstance(record.description, str) and isinstance(record.facp_date, str))
+
+
+def encode_item(item: Any) -> bytes:
+    if not encodable(item):
+        return pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+    publish_type, record = item
+    event = record.event.encode()
+    description = record.description.encode()
+    facp_date = record.facp_date.encode()
+    source = record.source.encode() if record.source is not None else b""
+    if max(len(event), len(description), len(facp_date), len(source)) > 0xFFFF:
+        return pickle.dumps(item, pickle.HIGHEST_PROTOCOL)
+    flags = ((HAS_SOURCE if record.source is not None else 0) | (HAS_TRACE if record.trace is not None else 0)
+             | (HAS_SEQ if record.seq is not None else 0) | (HAS_REPEATS if record.repeats is not None else 0))
+    parts = [RECORD_HEADER.pack(RECORD_TAG, publish_type.value, record.severity, flags, record.sbc_date,
+                                len(event), len(description), len(facp_date), len(source)),
+             event, description, facp_date, source]
+    if record.trace is not None:
+        parts.append(TRACE.pack(*record.trace))
+    if record.seq is not None:
+        parts.append(SEQUENCE.pack(record.seq))
+    if record.repeats is not None:
+        parts.append(REPEATS.pack(record.repeats, record.first_date if record.first_date is not None else record.sbc_date))
+    return b"".join(parts)
+
+
+def decode_item(data: bytes) -> Any:
+    if not data or data[0] != RECORD_TAG:
+        return pickle.loads(data)
+    _, publish_type, severity, flags, sbc_date, event_length, description_length, facp_length, source_length = \
+        RECORD_HEADER.unpack_from(data)
+    view = memoryview(data)
+    position = RECORD_HEADER.size
+    event = str(view[position:position + event_length], "utf-8")
+    position += event_length
+    description = str(view[position:position + description_length], "utf-8")
+    position += description_length
+    facp_date = str(view[position:position + facp_length], "utf-8")
+    position += facp_length
+    source = str(view[position:position + source_length], "utf-8") if flags & HAS_SOURCE else None
+    position += source_length
+    trace = None
+    if flags & HAS_TRACE:
+        trace = TRACE.unpack_from(data, position)
+        position += TRACE.size
+    seq = None
+    if flags & HAS_SEQ:
+        seq = SEQUENCE.unpack_from(data, position)[0]
+        position += SEQUENCE.size
+    repeats, first_date = REPEATS.unpack_from(data, position) if flags & HAS_REPEATS else (None, None)
+    return PUBLISH_TYPES[publish_type], EventRecord(event, description, severity, sbc_date, facp_date, source, trace, seq,
+                                                    repeats, first_date)
+
+
+def encode_items(items: List[Any]) -> bytes:
+    # Tag and count, then each item with its length; used for spill files, which hold a batch per file
+    parts = [bytes((BATCH_TAG,)), COUNT.pack(len(items))]
+    for item in items:
+        data = encode_item(item)
+        parts.append(COUNT.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_items(data: bytes) -> List[Any]:
+    if not data or data[0] != BATCH_TAG:
+        return pickle.loads(data)
+    count = COUNT.unpack_from(data, 1)[0]
+    position = 1 + COUNT.size
+    items = []
+    for _ in range(count):
+        length = COUNT.unpack_from(data, position)[0]
+        position += COUNT.size
+        items.append(decode_item(data[position:position + length]))
+        position += length
+    return items
+
+
+def item_codec(codec: str) -> Dict[str, Any]:
+    # Decoding reads both formats, so switching codec keeps an existing log or database readable
+    if codec == "pickle":
+        return {"encode": pickle.dumps, "decode": decode_item}
+    return {"encode": encode_item, "decode": decode_item}
+
+
+def batch_codec(codec: str) -> Dict[str, Any]:
+    if codec == "pickle":
+        return {"encode": pickle.dumps, "decode": decode_items}
+    return {"encode": encode_items, "decode": decode_items}
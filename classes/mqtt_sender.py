@@ -1,113 +1,382 @@
-from tb_device_mqtt import TBDeviceMqttClient
+from tb_device_mqtt import TBDeviceMqttClient, TBPublishInfo
 from app_utils.queue_operations import SafeQueue
+import json
 import logging
-from typing import Dict, Any, Callable
+import random
+from collections import deque
+from typing import Deque, Dict, Any, Callable, List, Set, Tuple
 import threading
 import time
 from classes.enums import PublishType
+from app_utils.latency_histogram import LatencyHistogram, StageLatencyTracker
+from app_utils.rate_limiter import RateLimiter
+from app_utils.timestamps import format_sbc_date
 from config.schema import ConfigSchema
 import queue
-from collections import deque
-
-class APILimitsManager:
-    def __init__(self):
-        self.second_limit = 100
-        self.minute_limit = 3000
-        self.hour_limit = 7000
-        self.second_window = deque()
-        self.minute_window = deque()
-        self.hour_window = deque()
-
-    def can_send(self) -> bool:
-        current_time = time.time()
-        self._update_windows(current_time)
-        
-        if (len(self.second_window) < self.second_limit and
-            len(self.minute_window) < self.minute_limit and
-            len(self.hour_window) < self.hour_limit):
-            self._add_request(current_time)
-            return True
-        return False
-
-    def _update_windows(self, current_time: float):
-        self._clean_window(self.second_window, current_time - 1)
-        self._clean_window(self.minute_window, current_time - 60)
-        self._clean_window(self.hour_window, current_time - 3600)
 
-    def _clean_window(self, window: deque, oldest_allowed: float):
-        while window and window[0] < oldest_allowed:
-            window.popleft()
+class InFlightPublish:
+    __slots__ = ("result", "items", "sent_at", "connection")
 
-    def _add_request(self, current_time: float):
-        self.second_window.append(current_time)
-        self.minute_window.append(current_time)
-        self.hour_window.append(current_time)
+    def __init__(self, result: TBPublishInfo, items: List[Tuple[PublishType, Any]], sent_at: float, connection: int):
+        self.result = result
+        self.items = items
+        self.sent_at = sent_at
+        self.connection = connection
 
 class MqttHandler:
-    def __init__(self, config: ConfigSchema, queue: SafeQueue):
+    def __init__(self, config: ConfigSchema, queue: SafeQueue, client: TBDeviceMqttClient | None = None):
         self.config = config
         self.queue = queue
         self.logger = logging.getLogger(__name__)
-        self.reconnect_interval = 5
         self.device_token = config.thingsboard.device_token
         self.tb_host = config.thingsboard.host
         self.tb_port = config.thingsboard.port
-        self.client: TBDeviceMqttClient = TBDeviceMqttClient(host=self.tb_host, username=self.device_token, port=self.tb_port)
-        self.client.connect()
-        self.api_limits_manager = APILimitsManager()
+        self.reconnect_min_delay = config.thingsboard.reconnect_min_delay
+        self.reconnect_max_delay = config.thingsboard.reconnect_max_delay
+        self.connect_timeout = config.thingsboard.connect_timeout
+        self.client: TBDeviceMqttClient = client or TBDeviceMqttClient(host=self.tb_host, username=self.device_token, port=self.tb_port)
+        self.shutdown_flag = threading.Event()
+        # Set and cleared by the client's connect/disconnect callbacks; nothing polls the link
+        self.connected = threading.Event()
+        self.link_lost = threading.Event()
+        # Bumped on every CONNACK; publishes sent on an earlier connection will never see their PUBACK
+        self.connection_count = 0
+        self.disconnected_at: float | None = None
+        self.reconnected_at: float | None = None
+        self.reconnect_latency = LatencyHistogram()
+        # Constant memory whatever the window; the clock is looked up here so tools can swap the time module
+        self.rate_limiter = RateLimiter(((limit.messages, limit.period) for limit in config.publish.rate_limits), time.monotonic)
+        self.batch_size = max(config.publish.batch_size, 1)
+        self.batch_bytes = config.publish.batch_bytes
+        self.idle_timeout = config.publish.idle_timeout
+        # QoS1 publishes waiting for their PUBACK, oldest first; their messages stay in the durable queue until then
+        self.inflight: Deque[InFlightPublish] = deque()
+        self.inflight_window = max(config.publish.inflight_window, 1)
+        self.ack_timeout = config.publish.ack_timeout
+        # PUBACKs are signalled by the client's on_publish callback, which runs just before paho marks the
+        # message published; the publisher waits on this instead of polling the in-flight publishes
+        self.acked = threading.Condition()
+        self.acked_mids: Set[int] = set()
+        self.ack_callbacks = False
+        # Only for clients handed in by tools, which have no callback to signal a PUBACK
+        self.ack_poll_interval = 0.01
+        self.attach_callbacks()
+        # Last ts published and the SBC_date ts it was bumped from; see entry_ts
+        self.last_ts = 0
+        self.last_base_ts = 0
+        self.published_messages = 0
+        self.latency_tracker = StageLatencyTracker()
         logging.getLogger('tb_connection').setLevel(logging.WARNING)
 
-    def connect(self):
+    def attach_callbacks(self) -> None:
+        mqtt_client = getattr(self.client, "_client", None)
+        if mqtt_client is None:
+            # Clients handed in by tools have no paho client underneath and are connected from the start
+            if self.client_connected():
+                self.on_connect()
+            return
+        # Reconnecting is done by maintain_connection, with jitter; paho would retry on a fixed doubling schedule
+        mqtt_client._reconnect_on_failure = False
+        client_on_connect, client_on_disconnect = mqtt_client.on_connect, mqtt_client.on_disconnect
+        client_on_publish = mqtt_client.on_publish
+
+        def on_connect(client, userdata, connect_flags, reason_code, *args):
+            client_on_connect(client, userdata, connect_flags, reason_code, *args)
+            if reason_code == 0:
+                self.on_connect()
+
+        def on_disconnect(*args):
+            client_on_disconnect(*args)
+            self.on_disconnect()
+
+        def on_publish(client, userdata, mid, *args):
+            if client_on_publish is not None:
+                client_on_publish(client, userdata, mid, *args)
+            self.on_publish(mid)
+
+        mqtt_client.on_connect = on_connect
+        mqtt_client.on_disconnect = on_disconnect
+        mqtt_client.on_publish = on_publish
+        self.ack_callbacks = True
+
+    def client_connected(self) -> bool:
+        state = self.client.is_connected
+        return state() if callable(state) else bool(state)
+
+    def on_connect(self) -> None:
+        self.connection_count += 1
+        self.reconnected_at = time.monotonic() if self.disconnected_at is not None else None
+        self.link_lost.clear()
+        self.connected.set()
+        # Message ids of the lost connection mean nothing on this one; its unacked publishes are retried
+        self.signal_acks(clear=True)
+        # Wakes a publisher waiting for the link
+        self.queue.wake()
+        self.logger.info("Connected to ThingsBoard")
+
+    def on_disconnect(self) -> None:
+        if self.connected.is_set() and not self.shutdown_flag.is_set():
+            self.disconnected_at = time.monotonic()
+            self.logger.warning("Connection to ThingsBoard lost")
+        self.connected.clear()
+        self.link_lost.set()
+        self.signal_acks()
+
+    def on_publish(self, mid: int) -> None:
+        with self.acked:
+            self.acked_mids.add(mid)
+            self.acked.notify_all()
+        # A publisher with nothing to send waits on the queue; the ack still has to be collected
+        self.queue.wake()
+
+    def signal_acks(self, clear: bool = False) -> None:
+        # Wakes a publisher waiting for its window, to re-check the in-flight publishes
+        with self.acked:
+            if clear:
+                self.acked_mids.clear()
+            self.acked.notify_all()
+
+    def connect(self) -> bool:
         try:
+            mqtt_client = getattr(self.client, "_client", None)
+            if mqtt_client is not None:
+                # The network thread of the lost connection must be gone before connect starts a new one
+                mqtt_client.loop_stop()
             self.client.connect()
-
+            return True
         except Exception as e:
             self.logger.error(f"Failed to connect to ThingsBoard: {e}")
+            return False
+
+    def maintain_connection(self) -> None:
+        delay = self.reconnect_min_delay
+        while not self.shutdown_flag.is_set():
+            if self.connected.is_set():
+                delay = self.reconnect_min_delay
+                self.link_lost.wait()
+                continue
+            if self.connect() and self.connected.wait(self.connect_timeout):
+                continue
+            # Jittered exponential backoff, so gateways cut off together do not all come back in the same second
+            wait = random.uniform(delay / 2, delay)
+            self.logger.warning(f"Not connected to ThingsBoard. Retrying in {wait:.1f} s")
+            self.shutdown_flag.wait(wait)
+            delay = min(delay * 2, self.reconnect_max_delay)
+
+    def wait_for_connection(self) -> None:
+        self.connected.wait(self.idle_timeout)
+
+    def connection_summary(self) -> str:
+        return (f"MQTT connected={self.connected.is_set()} connections={self.connection_count} "
+                f"reconnect->first publish: {self.reconnect_latency.summary()}")
+
+    def prepare_payload(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        # Internal keys start with an underscore and never leave the gateway
+        payload = {key: value for key, value in message.items() if not key.startswith("_")}
+        for key in ("SBC_date", "first_SBC_date"):
+            if key in payload:
+                payload[key] = format_sbc_date(payload[key])
+        return payload
+
+    def entry_ts(self, message: Dict[str, Any]) -> int:
+        sbc_date = message.get("SBC_date")
+        ts = sbc_date // 1000 if isinstance(sbc_date, int) else int(time.time() * 1000)
+        # ThingsBoard keeps one value per key and ts, so an event read in the same millisecond as the previous
+        # one (or in a millisecond that one was moved to) goes one later. Any other message keeps its own ts,
+        # so one published out of order, after a requeue or behind a higher lane, stays where it happened.
+        if self.last_base_ts <= ts <= self.last_ts:
+            ts = self.last_ts + 1
+        else:
+            self.last_base_ts = ts
+        self.last_ts = ts
+        return ts
+
+    def check_result(self, result: TBPublishInfo) -> None:
+        if isinstance(result.message_info, list) and not result.message_info:
+            # The client gave up before sending any part of the payload, e.g. while waiting for its own rate limit
+            raise ConnectionError("The client sent no MQTT message for the payload")
+        rc = result.rc()
+        if rc != TBPublishInfo.TB_ERR_SUCCESS:
+            raise ConnectionError(TBPublishInfo.ERRORS_DESCRIPTION.get(rc, f"Error code {rc}"))
 
     def publish_telemetry(self, telemetry: Dict[str, Any], bypass_queue: bool = False):
-        if not self.client.is_connected:
+        if not self.connected.is_set():
             if bypass_queue:
                 self.logger.warning("Not connected to ThingsBoard. Dropping telemetry.")
                 return
             else:
                 self.logger.warning("Not connected to ThingsBoard. Queueing telemetry.")
-                self.queue.put((PublishType.TELEMETRY, telemetry))
+                self.queue.requeue((PublishType.TELEMETRY, telemetry))
                 return
 
-        if not self.api_limits_manager.can_send():
+        if self.rate_limiter.reserve() > 0:
             if bypass_queue:
                 self.logger.warning("API rate limit reached. Dropping telemetry.")
                 return
             else:
                 self.logger.warning("API rate limit reached. Queueing telemetry.")
-                self.queue.put((PublishType.TELEMETRY, telemetry))
+                self.queue.requeue((PublishType.TELEMETRY, telemetry))
                 return
+        self.send_telemetry(telemetry, requeue=not bypass_queue)
 
+    def send_telemetry(self, telemetry: Dict[str, Any], requeue: bool = True):
         try:
-            self.client.send_telemetry(telemetry)
-            self.logger.debug(f"Telemetry sent successfully: {telemetry}")
+            payload = self.prepare_payload(telemetry)
+            if requeue:
+                # With its own ts a retried message still lands in order on the ThingsBoard timeline
+                result = self.client.send_telemetry({"ts": self.entry_ts(telemetry), "values": payload})
+            else:
+                result = self.client.send_telemetry(payload)
+            self.check_result(result)
+            self.published_messages += 1
+            if requeue:
+                self.track(result, [(PublishType.TELEMETRY, telemetry)])
+            self.logger.debug(f"Telemetry sent: {payload}")
         except Exception as e:
             self.logger.error(f"Failed to publish telemetry: {e}")
-            if not bypass_queue:
-                self.queue.put((PublishType.TELEMETRY, telemetry))
+            if requeue:
+                self.queue.requeue((PublishType.TELEMETRY, telemetry))
 
     def publish_attributes(self, attributes: Dict[str, Any]):
-        if not self.client.is_connected:
+        if not self.connected.is_set():
             self.logger.warning("Not connected to ThingsBoard. Queueing attributes.")
-            self.queue.put((PublishType.ATTRIBUTE, attributes))
+            self.queue.requeue((PublishType.ATTRIBUTE, attributes))
             return
 
-        if not self.api_limits_manager.can_send():
+        if self.rate_limiter.reserve() > 0:
             self.logger.warning("API rate limit reached. Queueing attributes.")
-            self.queue.put((PublishType.ATTRIBUTE, attributes))
+            self.queue.requeue((PublishType.ATTRIBUTE, attributes))
             return
+        self.send_attributes(attributes)
 
+    def send_attributes(self, attributes: Dict[str, Any]):
         try:
-            self.client.send_attributes(attributes)
-            self.logger.debug(f"Attributes sent successfully: {attributes}")
+            result = self.client.send_attributes(self.prepare_payload(attributes))
+            self.check_result(result)
+            self.published_messages += 1
+            self.track(result, [(PublishType.ATTRIBUTE, attributes)])
+            self.logger.debug(f"Attributes sent: {attributes}")
         except Exception as e:
             self.logger.error(f"Failed to publish attributes: {e}")
-            self.queue.put((PublishType.ATTRIBUTE, attributes))
+            self.queue.requeue((PublishType.ATTRIBUTE, attributes))
+
+    def track(self, result: TBPublishInfo, items: List[Tuple[PublishType, Any]]) -> None:
+        self.inflight.append(InFlightPublish(result, items, time.monotonic(), self.connection_count))
+
+    def is_published(self, result: TBPublishInfo, acked_mids: Set[int]) -> bool:
+        # A payload the client split into several MQTT messages is acked when all of them are
+        infos = result.message_info if isinstance(result.message_info, list) else [result.message_info]
+        if not infos:
+            # Nothing was sent, so nothing can be acked; the messages go back to the queue
+            return False
+        return all((acked_mids and info.mid in acked_mids) or info.is_published() for info in infos)
+
+    def delivered(self, items: List[Tuple[PublishType, Any]]) -> None:
+        published_ns = time.monotonic_ns()
+        reconnected_at = self.reconnected_at
+        if reconnected_at is not None:
+            self.reconnected_at = None
+            resumed = published_ns / 1e9 - reconnected_at
+            self.reconnect_latency.record(int(resumed * 1e6))
+            self.logger.info(f"First publish {resumed * 1000:.0f} ms after reconnecting, "
+                             f"{reconnected_at - self.disconnected_at:.1f} s after the connection was lost")
+        for message_type, message in items:
+            self.queue.ack(message)
+            if message_type == PublishType.TELEMETRY:
+                self.latency_tracker.record(message.get("_trace"), published_ns)
+
+    def collect_acks(self) -> None:
+        # Every publish of ours is tracked before its ack is collected, so a signalled id that matches none of
+        # them is from the client's own requests or from a publish already retried, and is dropped here
+        with self.acked:
+            acked_mids, self.acked_mids = self.acked_mids, set()
+        now = time.monotonic()
+        pending: Deque[InFlightPublish] = deque()
+        retry: List[Tuple[PublishType, Any]] = []
+        for entry in self.inflight:
+            try:
+                published = self.is_published(entry.result, acked_mids)
+            except Exception as e:
+                self.logger.error(f"Publish of {len(entry.items)} messages failed: {e}")
+                retry.extend(entry.items)
+                continue
+            if published:
+                self.delivered(entry.items)
+            elif entry.connection != self.connection_count or now - entry.sent_at >= self.ack_timeout:
+                # The client drops unacked publishes with the connection, so those are retried without waiting
+                retry.extend(entry.items)
+            else:
+                pending.append(entry)
+        self.inflight = pending
+        if retry:
+            # Only what was not acked goes back, in the order it was first sent
+            self.logger.warning(f"No PUBACK for {len(retry)} messages. Re-queueing them.")
+            self.requeue_all(retry)
+
+    def ack_deadline(self) -> float:
+        # Seconds until the oldest unacked publish times out
+        return max(self.inflight[0].sent_at + self.ack_timeout - time.monotonic(), 0.0)
+
+    def wait_for_window(self) -> None:
+        self.collect_acks()
+        while len(self.inflight) >= self.inflight_window and not self.shutdown_flag.is_set():
+            if not self.ack_callbacks:
+                time.sleep(self.ack_poll_interval)
+            else:
+                with self.acked:
+                    # An ack signalled since the last collect_acks is still in acked_mids, so none is missed
+                    if not self.acked_mids:
+                        self.acked.wait(self.ack_deadline())
+            self.collect_acks()
+
+    def idle_wait(self) -> float:
+        # PUBACKs wake the publisher through the queue; by itself it only wakes to enforce the oldest ack timeout
+        if not self.inflight:
+            return self.idle_timeout
+        if not self.ack_callbacks:
+            return self.ack_poll_interval
+        with self.acked:
+            if self.acked_mids:
+                return 0.0
+        return min(self.ack_deadline(), self.idle_timeout)
+
+    def requeue_all(self, items: List[Tuple[PublishType, Any]]) -> None:
+        # requeue puts each message at the front of its lane, so the last one goes back first
+        for item in reversed(items):
+            self.queue.requeue(item)
+
+    def publish_batch(self, items: List[Tuple[PublishType, Any]]) -> None:
+        entries = []
+        sent: List[Tuple[PublishType, Any]] = []
+        size = 2
+        for index, (message_type, message) in enumerate(items):
+            if message_type == PublishType.ATTRIBUTE:
+                self.publish_attributes(message)
+                continue
+            if message_type != PublishType.TELEMETRY:
+                self.logger.error(f'PublishType {message_type} is not supported')
+                continue
+            values = self.prepare_payload(message)
+            entry_size = len(json.dumps(values)) + 32
+            if sent and size + entry_size > self.batch_bytes:
+                # Over the byte budget; the rest waits for the next batch, ahead of newer messages
+                self.requeue_all(items[index:])
+                break
+            size += entry_size
+            entries.append({"ts": self.entry_ts(message), "values": values})
+            sent.append((message_type, message))
+        if not sent:
+            return
+
+        try:
+            result = self.client.send_telemetry(entries)
+            self.check_result(result)
+            self.published_messages += 1
+            self.track(result, sent)
+            self.logger.debug(f"Telemetry batch of {len(entries)} sent")
+        except Exception as e:
+            self.logger.error(f"Failed to publish telemetry batch of {len(entries)}: {e}")
+            self.requeue_all(sent)
 
     def subscribe_to_attribute(self, attribute_name: str, callback: Callable):
         self.client.subscribe_to_attribute(attribute_name, callback)
@@ -116,38 +385,72 @@ class MqttHandler:
     def request_attributes(self, client_attribute_names: list, shared_attribute_names: list, callback: Callable):
         self.client.request_attributes(client_attribute_names, shared_attribute_names, callback=callback)
 
+    def process_batches(self):
+        while not self.shutdown_flag.is_set():
+            if not self.connected.is_set():
+                self.wait_for_connection()
+                continue
+            self.wait_for_window()
+            if not self.queue.wait_not_empty(self.idle_wait()) or self.wait_for_rate_limit():
+                continue
+            items = self.queue.get_batch(self.batch_size)
+            if not items:
+                continue
+            if self.rate_limiter.reserve() > 0:
+                # Another thread took the slot in between; the batch goes back in order
+                self.requeue_all(items)
+                continue
+            self.publish_batch(items)
+
+    def wait_for_rate_limit(self) -> bool:
+        # Sleeps exactly until the next send fits, leaving the queue untouched so order is kept
+        wait = self.rate_limiter.wait_time()
+        if wait <= 0:
+            return False
+        self.logger.debug(f"API rate limit reached. Next publish in {wait:.3f} s")
+        # The hourly limit can mean a long wait; shutdown must not be held up by it
+        self.shutdown_flag.wait(wait)
+        return True
+
+    def dispatch(self, message_type: PublishType, message: Dict[str, Any]):
+        if message_type == PublishType.TELEMETRY:
+            self.send_telemetry(message)
+        elif message_type == PublishType.ATTRIBUTE:
+            self.send_attributes(message)
+        else:
+            self.logger.error(f'PublishType {message_type} is not supported')
+
     def process_queue(self):
+        if self.batch_size > 1:
+            self.process_batches()
+            return
         while not self.shutdown_flag.is_set():
-            if self.client.is_connected:
+            if self.connected.is_set():
+                self.wait_for_window()
+                if not self.queue.wait_not_empty(self.idle_wait()) or self.wait_for_rate_limit():
+                    continue
                 try:
                     message_type, message = self.queue.get(block=False)
-                    if self.api_limits_manager.can_send():
-                        if message_type == PublishType.TELEMETRY:
-                            self.publish_telemetry(message)
-                        elif message_type == PublishType.ATTRIBUTE:
-                            self.publish_attributes(message)
-                        else:
-                            self.logger.error(f'PublishType {message_type} is not supported')
-                    else:
-                        self.logger.warning("API rate limit reached. Re-queueing message.")
-                        self.queue.put((message_type, message))
-                    time.sleep(0.1) 
                 except queue.Empty:
-                    time.sleep(1)
+                    continue
+                if self.rate_limiter.reserve() > 0:
+                    self.queue.requeue((message_type, message))
+                    continue
+                self.dispatch(message_type, message)
             else:
-                self.logger.warning("Not connected to ThingsBoard. Attempting to reconnect...")
-                self.connect()
-                time.sleep(self.reconnect_interval)
+                self.wait_for_connection()
 
     def start(self):
-        self.connect()
-        self.shutdown_flag = threading.Event()
-        time.sleep(2)
-        threading.Thread(target=self.process_queue, daemon=True).start()
+        # Neither thread waits for the other: messages queue up until the first CONNACK wakes the publisher
+        threading.Thread(target=self.maintain_connection, name="mqtt-connection", daemon=True).start()
+        threading.Thread(target=self.process_queue, name="mqtt-publisher", daemon=True).start()
         self.logger.info("MQTT Handler started")
 
     def stop(self):
         self.shutdown_flag.set()
+        self.link_lost.set()
+        self.signal_acks()
+        self.queue.wake()
         if self.client:
             self.client.disconnect()
         self.logger.info("MQTT Handler stopped")
\ No newline at end of file
@@ -0,0 +1,127 @@
+import os
+import re
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+from config.schema import PanelFieldSpec, PanelGrammarConfig, PanelRuleConfig
+from config.loader import load_panel_grammars
+
+DEFAULT_GRAMMAR_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "panelGrammars.yml")
+
+FieldExtractor = Callable[[List[str], Optional[re.Match], List[str]], str]
+ParsedEvent = Tuple[str, str, str, Optional[int]]
+
+
+def _parse_columns(columns: str) -> int | slice:
+    if ":" not in columns:
+        return int(columns)
+    start, stop = (int(bound) if bound.strip() else None for bound in columns.split(":", 1))
+    return slice(start, stop)
+
+
+def compile_field(spec: PanelFieldSpec) -> FieldExtractor:
+    if spec.value is not None:
+        value = spec.value
+        return lambda lines, match, columns: value
+
+    join = spec.join
+    if spec.line is not None:
+        index = spec.line
+        def extract(lines, match, columns):
+            return lines[index] if -len(lines) <= index < len(lines) else ""
+    elif spec.group is not None:
+        group = spec.group
+        def extract(lines, match, columns):
+            return (match.group(group) or "") if match else ""
+    elif spec.columns is not None:
+        selector = _parse_columns(spec.columns)
+        if isinstance(selector, int):
+            def extract(lines, match, columns):
+                return columns[selector] if -len(columns) <= selector < len(columns) else ""
+        else:
+            def extract(lines, match, columns):
+                return join.join(columns[selector])
+    else:
+        raise ValueError("A panel field needs one of: group, columns, line or value")
+
+    if spec.tokenize:
+        return lambda lines, match, columns: join.join(extract(lines, match, columns).split())
+    return lambda lines, match, columns: extract(lines, match, columns).strip()
+
+
+class GrammarRule:
+    def __init__(self, rule: PanelRuleConfig):
+        self.header_line = rule.header_line
+        self.line_count = rule.line_count
+        self.pattern = re.compile(rule.match) if rule.match else None
+        self.splitter = re.compile(rule.split) if rule.split else None
+        self.min_columns = rule.min_columns
+        self.max_columns = rule.max_columns
+        self.event = compile_field(rule.event)
+        self.description = compile_field(rule.description)
+        self.facp_date = compile_field(rule.facp_date)
+        self.continuation = rule.continuation
+        self.severity = rule.severity
+
+    def apply(self, lines: List[str]) -> ParsedEvent | None:
+        if self.line_count is not None and len(lines) != self.line_count:
+            return None
+        if self.header_line >= len(lines):
+            return None
+
+        header = lines[self.header_line]
+        match = None
+        columns: List[str] = []
+        if self.pattern:
+            match = self.pattern.match(header)
+            if match is None:
+                return None
+        if self.splitter:
+            columns = self.splitter.split(header)
+            if len(columns) < self.min_columns or (self.max_columns is not None and len(columns) > self.max_columns):
+                return None
+
+        description = self.description(lines, match, columns)
+        if self.continuation is not None and len(lines) > self.header_line + 1:
+            description += self.continuation + self.continuation.join(lines[self.header_line + 1:])
+
+        return self.event(lines, match, columns), description, self.facp_date(lines, match, columns), self.severity
+
+
+class PanelGrammar:
+    def __init__(self, panel_id: int, grammar: PanelGrammarConfig):
+        self.panel_id = panel_id
+        self.name = grammar.name
+        self.serial_config = {
+            "baudrate": grammar.serial.baudrate,
+            "bytesize": grammar.serial.bytesize,
+            "parity": grammar.serial.parity,
+            "stopbits": grammar.serial.stopbits,
+            "xonxoff": grammar.serial.xonxoff,
+            "timeout": grammar.serial.timeout
+        }
+        framing = grammar.framing
+        self.framing_mode = framing.mode
+        self.report_delimiter = framing.report_delimiter
+        self.max_report_delimiter_count = framing.max_report_delimiter_count
+        self.end_report_delimiter = framing.end_report_delimiter
+        self.event_start = re.compile(framing.event_start) if framing.event_start else None
+        self.line_separator = framing.line_separator
+        if self.framing_mode == "split" and self.event_start is None:
+            raise ValueError(f"Panel grammar {self.name} uses split framing without an event_start pattern")
+
+        self.rules = [GrammarRule(rule) for rule in grammar.rules]
+
+    def parse(self, lines: List[str]) -> ParsedEvent | None:
+        for rule in self.rules:
+            parsed = rule.apply(lines)
+            if parsed is not None:
+                return parsed
+        return None
+
+
+@lru_cache(maxsize=None)
+def load_default_grammar(panel_id: int) -> PanelGrammar:
+    grammars = load_panel_grammars(DEFAULT_GRAMMAR_PATH)
+    if panel_id not in grammars:
+        raise ValueError(f"Unsupported panel model: {panel_id}")
+    return PanelGrammar(panel_id, grammars[panel_id])
@@ -1,20 +1,58 @@
-import RPi.GPIO as GPIO
 import threading
-from typing import Dict
+import time
+from typing import Any, Dict
 from classes.enums import PublishType
 import logging
+from app_utils.gpio_backend import SimulatedGPIO, load_gpio
 from config.schema import ConfigSchema
 from classes.mqtt_sender import MqttHandler
 
+# Longest an interrupt-driven monitor sleeps before checking for shutdown and re-reading the pins,
+# which also catches an edge the kernel missed
+IDLE_WAKEUP = 1.0
+# Queue lane of a transition: an alarm relay edge goes out ahead of any event backlog, a trouble edge with the troubles
+RELAY_LANES = {'ALARM': 3, 'TROUBLE': 2}
+
+class DebouncedInput:
+    # A new level only counts once it has held for the debounce time, so contact bounce never reaches ThingsBoard
+    __slots__ = ("state", "candidate", "since")
+
+    def __init__(self, state: bool):
+        self.state = state
+        self.candidate: bool | None = None
+        self.since = 0.0
+
+    def update(self, level: bool, now: float, debounce: float) -> bool:
+        if level == self.state:
+            self.candidate = None
+            return False
+        if self.candidate != level:
+            self.candidate = level
+            self.since = now
+        if now - self.since < debounce:
+            return False
+        self.state = level
+        self.candidate = None
+        return True
+
 class RelayMonitor:
     def __init__(self, config: ConfigSchema, mqtt_handler: MqttHandler):
         self.config = config
         self.mqtt_handler = mqtt_handler
         self.relay_pins = self._get_relay_pins()
-        self.active_states = self._get_active_states()
-        self.publish_interval = config.relay_monitor.publish_interval
+        self.GPIO = load_gpio(config.relay_monitor.gpio_backend, self._inactive_levels())
+        self.enabled = self.GPIO is not None
+        self.detection = config.relay_monitor.detection
+        self.sample_interval = config.relay_monitor.sample_interval
+        self.debounce = config.relay_monitor.debounce
+        self.heartbeat_interval = config.relay_monitor.heartbeat_interval
+        self.inputs: Dict[str, DebouncedInput] = {}
+        # Set from the GPIO edge callback thread; the monitor thread does the reading and publishing
+        self.edge = threading.Event()
         self.logger = logging.getLogger(__name__)
-        self._setup_gpio()
+        if self.enabled:
+            self.active_states = self._get_active_states()
+            self._setup_gpio()
 
     def _get_relay_pins(self) -> Dict[str, int]:
         return {
@@ -22,42 +60,104 @@ class RelayMonitor:
             'TROUBLE': self.config.relay_monitor.trouble_pin
         }
 
+    def _inactive_levels(self) -> Dict[int, int]:
+        # Simulated relays idle released, so no alarm or trouble is reported until one is driven
+        monitor_config = self.config.relay_monitor
+        return {
+            monitor_config.alarm_pin: SimulatedGPIO.LOW if monitor_config.alarm_active_high else SimulatedGPIO.HIGH,
+            monitor_config.trouble_pin: SimulatedGPIO.LOW if monitor_config.trouble_active_high else SimulatedGPIO.HIGH
+        }
+
     def _get_active_states(self) -> Dict[str, int]:
         return {
-            'ALARM': GPIO.HIGH if self.config.relay_monitor.alarm_active_high else GPIO.LOW,
-            'TROUBLE': GPIO.HIGH if self.config.relay_monitor.trouble_active_high else GPIO.LOW
+            'ALARM': self.GPIO.HIGH if self.config.relay_monitor.alarm_active_high else self.GPIO.LOW,
+            'TROUBLE': self.GPIO.HIGH if self.config.relay_monitor.trouble_active_high else self.GPIO.LOW
         }
 
     def _setup_gpio(self):
-        GPIO.setmode(GPIO.BCM)
+        self.GPIO.setmode(self.GPIO.BCM)
         for pin in self.relay_pins.values():
-            GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            self.GPIO.setup(pin, self.GPIO.IN, pull_up_down=self.GPIO.PUD_UP)
+        if self.detection == "interrupt":
+            self._setup_edge_detection()
+
+    def _setup_edge_detection(self):
+        try:
+            for pin in self.relay_pins.values():
+                self.GPIO.add_event_detect(pin, self.GPIO.BOTH, callback=self._on_edge)
+        except RuntimeError as e:
+            # Some kernels refuse edge detection on a pin; sampling works everywhere
+            self.logger.warning(f"GPIO edge detection unavailable ({e}). Sampling relays every {self.sample_interval} s")
+            self.detection = "sample"
+
+    def _on_edge(self, pin: int):
+        self.edge.set()
 
     def monitor_relays(self, shutdown_flag: threading.Event):
+        if not self.enabled:
+            self.logger.info("Relay monitoring is disabled as RPi.GPIO is not available.")
+            # Returning would have the thread manager restart this thread every few seconds
+            shutdown_flag.wait()
+            return
+        self.inputs = {status: DebouncedInput(active) for status, active in self._read_relays().items()}
+        next_heartbeat = time.monotonic()
         while not shutdown_flag.is_set():
-            telemetry = self._get_relay_states()
-            self._publish_telemetry(telemetry)
-            
-            if shutdown_flag.wait(self.publish_interval):
-                break
-
-    def _get_relay_states(self) -> Dict[str, bool]:
-        states = {}
-        for status, pin in self.relay_pins.items():
-            gpio_state = GPIO.input(pin)
-            active_state = self.active_states[status]
-            is_active = gpio_state == active_state
-            states[f"{status.lower()}_relay"] = is_active
-        return states
-
-    def _publish_telemetry(self, telemetry: Dict[str, bool]):
+            now = time.monotonic()
+            self._publish_changes(now)
+            if now >= next_heartbeat:
+                # The heartbeat only repeats the current states, so it is dropped rather than queued when offline
+                self._publish_telemetry(self._current_states(), bypass_queue=True)
+                next_heartbeat = now + self.heartbeat_interval
+            self._wait_for_input(shutdown_flag, next_heartbeat - time.monotonic())
+
+    def _wait_for_input(self, shutdown_flag: threading.Event, until_heartbeat: float):
+        if self.detection == "sample":
+            shutdown_flag.wait(max(min(self.sample_interval, until_heartbeat), 0))
+            return
+        timeout = min(until_heartbeat, IDLE_WAKEUP)
+        if any(relay.candidate is not None for relay in self.inputs.values()):
+            # A level seen after an edge is confirmed once it has held for the debounce time
+            timeout = min(timeout, self.debounce)
+        self.edge.wait(max(timeout, 0))
+        self.edge.clear()
+
+    def _read_relays(self) -> Dict[str, bool]:
+        return {status: self.GPIO.input(pin) == self.active_states[status] for status, pin in self.relay_pins.items()}
+
+    def _publish_changes(self, now: float):
+        changed = {}
+        lane = None
+        edge = now
+        for status, active in self._read_relays().items():
+            relay = self.inputs[status]
+            if relay.update(active, now, self.debounce):
+                changed[f"{status.lower()}_relay"] = active
+                lane = max(lane or 0, RELAY_LANES[status])
+                edge = min(edge, relay.since)
+        if changed:
+            self.logger.info(f'Relay state changed: {changed}')
+            # Stamped like a serial event with the time the new level first appeared, so a transition published
+            # after an outage keeps its own ts. The lane is internal and never published.
+            changed["SBC_date"] = time.time_ns() // 1000 - int((time.monotonic() - edge) * 1000000)
+            changed["_lane"] = lane
+            # Through the queue: a transition is kept across an outage, unlike a heartbeat
+            self._publish_telemetry(changed, bypass_queue=False)
+
+    def _current_states(self) -> Dict[str, bool]:
+        return {f"{status.lower()}_relay": relay.state for status, relay in self.inputs.items()}
+
+    def _publish_telemetry(self, telemetry: Dict[str, Any], bypass_queue: bool):
         try:
-            self.mqtt_handler.publish_telemetry(telemetry, bypass_queue=True)
-            #.logger.debug(f'Relay states published: {telemetry}')
+            if bypass_queue:
+                self.mqtt_handler.publish_telemetry(telemetry, bypass_queue=True)
+            else:
+                self.mqtt_handler.queue.put((PublishType.TELEMETRY, telemetry))
         except Exception as e:
             self.logger.error(f'Failed to publish relay states: {e}')
 
     def cleanup(self):
+        if not self.enabled:
+            return
         try:
             self._cleanup_gpio()
             self.logger.info("GPIO cleanup completed for RelayMonitor")
@@ -65,4 +165,7 @@ class RelayMonitor:
             self.logger.error(f"Error during GPIO cleanup in RelayMonitor: {e}")
 
     def _cleanup_gpio(self):
-        GPIO.cleanup(list(self.relay_pins.values()))
\ No newline at end of file
+        if self.detection == "interrupt":
+            for pin in self.relay_pins.values():
+                self.GPIO.remove_event_detect(pin)
+        self.GPIO.cleanup(list(self.relay_pins.values()))
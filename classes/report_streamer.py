@@ -0,0 +1,90 @@
+import logging
+import time
+from typing import Any, Callable, Dict, List
+from classes.enums import PublishType
+from app_utils.timestamps import format_sbc_date
+
+
+class ReportStreamer:
+    def __init__(self, publish: Callable[[PublishType, Dict[str, Any]], None], batch_lines: int = 25, batch_bytes: int = 2048,
+                 wall_clock: Callable[[], int] = lambda: time.time_ns() // 1000):
+        self.publish = publish
+        # Epoch microseconds for report dates; the serial handler passes the arrival of the line being handled
+        self.wall_clock = wall_clock
+        self.batch_lines = batch_lines
+        self.batch_bytes = batch_bytes
+        self.logger = logging.getLogger(__name__)
+        self.active = False
+        self.report_id = 0
+        self.report_date = ""
+        self.section = 0
+        self.section_title = ""
+        self.part = 0
+        self.sections_published = 0
+        self.total_lines = 0
+        self.lines: List[str] = []
+        self.pending_bytes = 0
+
+    def start(self) -> None:
+        self.active = True
+        # Millisecond timestamp, bumped so back-to-back reports never share an ID
+        started_us = self.wall_clock()
+        self.report_id = max(started_us // 1000, self.report_id + 1)
+        self.report_date = format_sbc_date(started_us)
+        self.section = 0
+        self.section_title = ""
+        self.part = 0
+        self.sections_published = 0
+        self.total_lines = 0
+        self.lines = []
+        self.pending_bytes = 0
+        self.logger.debug(f"Report {self.report_id} started")
+
+    def next_section(self) -> None:
+        if not self.active:
+            self.start()
+        self.flush()
+        self.section += 1
+        self.section_title = ""
+        self.part = 0
+
+    def feed(self, line: str) -> None:
+        if not self.active:
+            self.start()
+        if not self.section_title:
+            self.section_title = line
+        self.lines.append(line)
+        self.pending_bytes += len(line) + 1
+        if len(self.lines) >= self.batch_lines or self.pending_bytes >= self.batch_bytes:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.lines:
+            return
+        self.publish(PublishType.TELEMETRY, {
+            "report_id": self.report_id,
+            "report_section": self.section,
+            "report_title": self.section_title,
+            "report_part": self.part,
+            "report_lines": "\n".join(self.lines),
+            "SBC_date": self.wall_clock()
+        })
+        if self.part == 0:
+            self.sections_published += 1
+        self.total_lines += len(self.lines)
+        self.part += 1
+        self.lines = []
+        self.pending_bytes = 0
+
+    def finish(self) -> None:
+        if not self.active:
+            return
+        self.flush()
+        self.publish(PublishType.ATTRIBUTE, {
+            "last_report_id": self.report_id,
+            "last_report_date": self.report_date,
+            "last_report_sections": self.sections_published,
+            "last_report_lines": self.total_lines
+        })
+        self.logger.info(f"Report {self.report_id} published: {self.sections_published} sections, {self.total_lines} lines")
+        self.active = False
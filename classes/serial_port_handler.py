@@ -1,20 +1,30 @@
 import serial
 from app_utils.queue_operations import SafeQueue
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Callable, Iterator, List
 from classes.enums import PublishType
+from app_utils.byte_framer import ByteFramer
+from app_utils.port_statistics import PortStatistics
+from app_utils.timestamps import ArrivalStamp, arrival_stamp
+from app_utils.serial_journal import SerialJournal, journal_directory
+from classes.report_streamer import ReportStreamer
+from classes.event_coalescer import EventCoalescer
+from classes.event_record import EventRecord
+import selectors
 import time
 import logging
 import threading
 from config.schema import ConfigSchema
 
 class SerialPortHandler:
-    def __init__(self, config: ConfigSchema, eventSeverityLevels: Dict[str, int], queue: SafeQueue):
+    def __init__(self, config: ConfigSchema, eventSeverityLevels: Dict[str, int], queue: SafeQueue, port: str | None = None, source: str | None = None):
         self.config = config
         self.queue = queue
+        self.port = port or config.serial.puerto
+        self.source = source
         self.eventSeverityLevels = eventSeverityLevels
         self.ser: serial.Serial | None = None
         self.logger = logging.getLogger(__name__)
-        self.report_delimiter = ""
+        self.report_delimiter: str | None = None
         self.max_report_delimiter_count = -1
         self.default_event_severity_not_recognized = 0
         self.parity_dic = {'none': serial.PARITY_NONE, 
@@ -25,10 +35,45 @@ class SerialPortHandler:
         self.max_reconnect_delay = 60
         self.base_delay = 1
         self.serial_config = {}
+        self.selector: selectors.BaseSelector | None = None
+        self.framer = ByteFramer()
+        self.read_buffer = bytearray(4096)
+        self.last_byte_time = 0.0
+        # Stamps every read; the journal replay substitutes the wall clock each read was journaled at
+        self.read_stamp: Callable[[], ArrivalStamp] = arrival_stamp
+        # Arrival of the line being handled and of the first line of the event being buffered
+        self.line_arrival: ArrivalStamp = arrival_stamp()
+        self.event_arrival: ArrivalStamp = self.line_arrival
+        self.report_streamer = ReportStreamer(self.queue_message, config.reports.batch_lines, config.reports.batch_bytes,
+                                              lambda: self.line_arrival[0])
+        self.statistics = PortStatistics(self.port, type(self).__name__)
+        self.coalescer: EventCoalescer | None = None
+        if config.coalesce.enabled:
+            self.coalescer = EventCoalescer(self.queue_event, config.coalesce.window, config.coalesce.pass_severity,
+                                            config.coalesce.max_bursts)
+        self.journal: SerialJournal | None = None
+        # Called with the port once, the first time it opens
+        self.on_ready: Callable[[str], None] | None = None
+        if config.journal.enabled:
+            self.open_journal()
+
+    def open_journal(self) -> None:
+        journal_config = self.config.journal
+        try:
+            self.journal = SerialJournal(journal_directory(journal_config.directory, self.port), journal_config.segment_size,
+                                         journal_config.segments, journal_config.flush_interval)
+        except (OSError, ValueError) as e:
+            self.logger.error(f"Could not open the serial journal, raw capture disabled: {e}")
+            self.journal = None
+
+    def close_journal(self) -> None:
+        if self.journal:
+            self.journal.close()
+            self.journal = None
 
     def init_serial_port(self) -> None:
         self.ser = serial.Serial(
-            port=self.config.serial.puerto,
+            port=self.port,
             baudrate=self.serial_config.get('baudrate'),
             bytesize=self.serial_config.get('bytesize'),
             parity=self.parity_dic[self.serial_config.get('parity')],
@@ -44,22 +89,106 @@ class SerialPortHandler:
             if not self.ser.is_open:
                 self.ser.open()
                 self.queue.is_serial_connected = True
+            if self.selector is None:
+                self.register_selector()
             self.logger.debug("Serial connected")
                 
         except serial.SerialException as e:
             raise serial.SerialException(f"An error occurred while opening the specified port: {e}")
         
+    def register_selector(self) -> None:
+        if self.config.serial.read_mode != "select":
+            return
+        try:
+            fileno = self.ser.fileno()
+        except (AttributeError, OSError, ValueError, serial.SerialException):
+            self.logger.warning("Serial port does not expose a file descriptor. Falling back to polling.")
+            return
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(fileno, selectors.EVENT_READ)
+
+    def unregister_selector(self) -> None:
+        if self.selector:
+            try:
+                self.selector.close()
+            except Exception as e:
+                self.logger.error(f"Error closing serial selector: {e}")
+        self.selector = None
+
+    def wait_for_data(self, shutdown_flag: threading.Event) -> bool:
+        if self.ser.in_waiting > 0:
+            return True
+        if self.selector is None:
+            shutdown_flag.wait(self.config.serial.poll_interval)
+            return False
+        # Readiness without queued bytes means the device went away; let the read raise it
+        return bool(self.selector.select(self.config.serial.idle_wakeup_interval))
+
+    def read_lines(self, shutdown_flag: threading.Event) -> Iterator[str]:
+        read_view = memoryview(self.read_buffer)
+        frame_idle_timeout = self.serial_config.get('timeout') or 1
+        statistics = self.statistics
+        thread_cpu_start = time.thread_time()
+        cpu_base = statistics.cpu_time
+        self.framer.reset()
+        while not shutdown_flag.is_set():
+            has_data = self.wait_for_data(shutdown_flag)
+            if self.coalescer:
+                # Bursts close on the reader's own wakeups, so a held summary waits at most idle_wakeup_interval extra
+                self.coalescer.flush()
+            statistics.cpu_time = cpu_base + time.thread_time() - thread_cpu_start
+            if not has_data:
+                # Same inter-byte timeout readline() applied: an unterminated line is still a line
+                if self.framer.pending and time.monotonic() - self.last_byte_time >= frame_idle_timeout:
+                    line, self.line_arrival = self.framer.flush()
+                    yield line
+                continue
+            to_read = min(max(self.ser.in_waiting, 1), len(self.read_buffer))
+            count = self.ser.readinto(read_view[:to_read])
+            if not count:
+                continue
+            stamp = self.read_stamp()
+            self.last_byte_time = stamp[1] / 1e9
+            if self.journal:
+                self.journal.append(read_view[:count], stamp[0])
+            frames = self.framer.feed(read_view[:count], stamp)
+            statistics.bytes_read += count
+            statistics.frames += len(frames)
+            for line, self.line_arrival in frames:
+                yield line
+
+    def queue_message(self, publish_type: PublishType, message: Dict[str, Any], trace: Tuple[int, int] | None = None) -> None:
+        if self.source:
+            message["source"] = self.source
+        if trace is not None:
+            # Monotonic arrival, parsed and queued times; stripped before publishing
+            message["_trace"] = (*trace, time.monotonic_ns())
+        self.queue.put((publish_type, message))
+
     def publish_parsed_report(self, buffer: str) -> None:
-        self.logger.warning("Publish reports is currently not supported. Dismissing report.")
+        if not self.config.reports.enabled:
+            self.logger.debug("Report publishing is disabled. Dismissing report.")
+            return
+        # The report body was already streamed section by section while it arrived
+        self.report_streamer.finish()
 
     def publish_parsed_event(self, buffer: str) -> None:
         parsed_data = self.parse_string_event(buffer)
         if parsed_data is not None:
-            self.logger.info(f'Event queued: {parsed_data}')
-            self.queue.put((PublishType.TELEMETRY, parsed_data))
+            self.statistics.events += 1
+            trace = (self.event_arrival[1], time.monotonic_ns())
+            if self.coalescer and isinstance(parsed_data, EventRecord):
+                self.coalescer.submit(parsed_data, trace)
+                self.statistics.coalesced = self.coalescer.coalesced
+            else:
+                self.queue_event(parsed_data, trace)
         else:
             self.logger.debug("The parsed event information is empty, skipping MQTT publish.")
 
+    def queue_event(self, event: Dict[str, Any] | EventRecord, trace: Tuple[int, int] | None) -> None:
+        self.queue_message(PublishType.TELEMETRY, event, trace)
+        self.logger.info(f'Event queued: {event}')
+
     def parse_string_event(self, event: str) -> Dict[str, Any] | None:
         self.logger.error("The 'parse_string_event' function must be implemented in the specific handler!")
         return None
@@ -82,6 +211,7 @@ class SerialPortHandler:
                     break
 
     def close_serial_port(self) -> None:
+        self.unregister_selector()
         if self.ser:
             try:
                 if self.ser.is_open:
@@ -93,50 +223,64 @@ class SerialPortHandler:
         self.queue.is_serial_connected = False
 
     def process_incoming_data(self, shutdown_flag: threading.Event) -> None:
-        buffer = ""
+        buffer: List[str] = []
         report_count = 0
 
         if self.ser is None:
             raise ValueError("Serial port is not initialized")
 
         try:
-            while not shutdown_flag.is_set():
-                if self.ser.in_waiting > 0:
-                    raw_data = self.ser.readline()
-                    incoming_line = raw_data.decode('latin-1').strip()
-                    if not incoming_line:
-                        if_eof = self.handle_empty_line(buffer, report_count)
-                        if if_eof:
-                            buffer = ""
-                            report_count = 0
-                    else:
-                        buffer, report_count = self.handle_data_line(incoming_line, buffer, report_count)
+            for line in self.read_lines(shutdown_flag):
+                incoming_line = line.strip()
+                if not incoming_line:
+                    if_eof = self.handle_empty_line(buffer, report_count)
+                    if if_eof:
+                        buffer = []
+                        report_count = 0
                 else:
-                    time.sleep(0.1)
+                    buffer, report_count = self.handle_data_line(incoming_line, buffer, report_count)
         except (serial.SerialException, serial.SerialTimeoutException, OSError) as e:
             raise serial.SerialException(str(e))
         except (TypeError, UnicodeDecodeError) as e:
-            if buffer:
-                if report_count > 0:
-                    self.publish_parsed_report(buffer)
-                else:
-                    self.publish_parsed_event(buffer)
+            self.flush_buffer(buffer, report_count)
             raise TypeError(str(e))
         except Exception as e:
             raise Exception(f"Unexpected failure occurred: {str(e)}")
 
-    def handle_data_line(self, incoming_line: str, buffer: str, report_count: int) -> Tuple[str, int]:
-        if self.report_delimiter in incoming_line:
+    def flush_buffer(self, buffer: List[str], report_count: int) -> None:
+        if buffer:
+            if report_count > 0:
+                self.publish_parsed_report("\n".join(buffer))
+            else:
+                self.publish_parsed_event("\n".join(buffer))
+
+    def handle_data_line(self, incoming_line: str, buffer: List[str], report_count: int) -> Tuple[List[str], int]:
+        if self.report_delimiter and self.report_delimiter in incoming_line:
             report_count += 1
-        buffer += incoming_line + "\n"
+            if report_count == 1 and self.config.reports.enabled:
+                self.report_streamer.start()
+                for header_line in buffer:
+                    self.report_streamer.feed(header_line)
+            if self.config.reports.enabled:
+                self.report_streamer.next_section()
+        elif report_count > 0 and self.config.reports.enabled:
+            self.report_streamer.feed(incoming_line)
+
+        if not buffer:
+            self.event_arrival = self.line_arrival
+        if report_count > 0:
+            # Reports are streamed out as they arrive; only the last line is kept for end-of-report checks
+            buffer[:] = [incoming_line]
+        else:
+            buffer.append(incoming_line)
         return buffer, report_count
 
-    def handle_empty_line(self, buffer: str, report_count: int) -> bool:
-        if report_count == self.max_report_delimiter_count and buffer.strip():
-            self.publish_parsed_report(buffer)
+    def handle_empty_line(self, buffer: List[str], report_count: int) -> bool:
+        if report_count == self.max_report_delimiter_count and any(buffer):
+            self.publish_parsed_report("\n".join(buffer))
             return True
-        elif report_count == 0 and buffer.strip():
-            self.publish_parsed_event(buffer)
+        elif report_count == 0 and any(buffer):
+            self.publish_parsed_event("\n".join(buffer))
             return True
         else:
             return False
@@ -151,6 +295,9 @@ class SerialPortHandler:
         while not shutdown_flag.is_set():
             try:
                 self.open_serial_port()
+                if self.on_ready:
+                    self.on_ready(self.port)
+                    self.on_ready = None
                 self.process_incoming_data(shutdown_flag)
             except (serial.SerialException, serial.SerialTimeoutException) as e:
                 self.logger.error(f"Lost serial connection. Retrying in 5 seconds. Error: {e} ")
@@ -168,4 +315,7 @@ class SerialPortHandler:
                     break
             else:
                 delay = 1 
+        if self.coalescer:
+            # Held repeats go into the queue so they are persisted with it
+            self.coalescer.flush_all()
         self.close_serial_port()
\ No newline at end of file
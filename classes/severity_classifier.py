@@ -0,0 +1,95 @@
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+RULE_KEYS = ("exact", "prefixes", "keywords", "ignore_case", "default")
+
+
+class KeywordMatcher:
+    # Aho-Corasick automaton; prefixes are keywords that only count when they end at len(pattern) - 1
+    def __init__(self):
+        self.transitions: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.outputs: List[List[Tuple[int, int, bool]]] = [[]]
+
+    def add(self, pattern: str, severity: int, anchored: bool) -> None:
+        if not pattern:
+            raise ValueError("Severity keywords and prefixes cannot be empty")
+        state = 0
+        for char in pattern:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.transitions[state][char] = next_state
+            state = next_state
+        self.outputs[state].append((len(pattern), severity, anchored))
+
+    def build(self) -> None:
+        pending = deque(self.transitions[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self.transitions[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.transitions[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def highest(self, text: str) -> Optional[int]:
+        transitions, fail, outputs = self.transitions, self.fail, self.outputs
+        best = None
+        state = 0
+        for position, char in enumerate(text, 1):
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            for length, severity, anchored in outputs[state]:
+                if anchored and length != position:
+                    continue
+                if best is None or severity > best:
+                    best = severity
+        return best
+
+
+class SeverityClassifier:
+    def __init__(self, levels: Dict[str, Any] | None, default: int = 0, cache_size: int = 1024):
+        levels = levels or {}
+        # A plain {event: severity} map is the original format and means exact matches only
+        if not any(key in levels for key in RULE_KEYS):
+            levels = {"exact": levels}
+
+        self.ignore_case = bool(levels.get("ignore_case", False))
+        self.default = int(levels.get("default", default))
+        self.exact = {self._normalize(str(event)): int(severity) for event, severity in (levels.get("exact") or {}).items()}
+
+        self.matcher: KeywordMatcher | None = None
+        prefixes = levels.get("prefixes") or {}
+        keywords = levels.get("keywords") or {}
+        if prefixes or keywords:
+            self.matcher = KeywordMatcher()
+            for prefix, severity in prefixes.items():
+                self.matcher.add(self._normalize(str(prefix)), int(severity), True)
+            for keyword, severity in keywords.items():
+                self.matcher.add(self._normalize(str(keyword)), int(severity), False)
+            self.matcher.build()
+
+        self.classify = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _normalize(self, text: str) -> str:
+        return text.lower() if self.ignore_case else text
+
+    def _classify(self, event_id: str) -> int:
+        normalized = self._normalize(event_id)
+        severity = self.exact.get(normalized)
+        if severity is not None:
+            return severity
+        if self.matcher is not None:
+            severity = self.matcher.highest(normalized)
+            if severity is not None:
+                return severity
+        return self.default
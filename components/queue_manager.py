@@ -1,23 +1,66 @@
+import os
 import threading
 import logging
+import time
+from typing import Any, List
 from app_utils.file_operations import save_to_file, load_from_file
 from app_utils.queue_operations import SafeQueue
+from app_utils.spill_lanes import SpillingLanes
+from app_utils.sqlite_queue import SqliteQueue
+from app_utils.write_ahead_log import WriteAheadLog
+from classes.event_record import batch_codec, item_codec
+from config.schema import QueueConfig
 import pickle
 
+def create_queue(config: QueueConfig) -> SafeQueue:
+    if config.backend == "sqlite":
+        try:
+            return SqliteQueue(config.path, fsync=config.fsync, prefetch=config.prefetch, priority_lanes=config.priority_lanes,
+                               lane_weights=config.lane_weights, default_lane=config.default_lane, **item_codec(config.codec))
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Error opening queue database {config.path}, falling back to periodic snapshots: {e}")
+    spill = None
+    if config.memory_items > 0 and config.backend == "pickle":
+        # A snapshot is the whole queue in one pickle, so it would read every spill file back into memory
+        logging.getLogger(__name__).warning("queue.memory_items is ignored with the pickle backend; use wal or sqlite to cap queue memory")
+    elif config.memory_items > 0:
+        spill = {"directory": config.spill_path, "memory_items": config.memory_items, "segment_items": config.spill_segment_items,
+                 "disk_bytes": config.disk_bytes, "overflow": config.overflow, **batch_codec(config.codec)}
+    return SafeQueue(priority_lanes=config.priority_lanes, lane_weights=config.lane_weights, default_lane=config.default_lane, spill=spill)
+
 class QueueManager:
-    def __init__(self, queue: SafeQueue, queue_file_path: str):
+    def __init__(self, queue: SafeQueue, queue_file_path: str, config: QueueConfig | None = None):
         self.queue = queue
         self.queue_file_path = queue_file_path
+        self.config = config or QueueConfig(backend="pickle")
+        self.log: WriteAheadLog | None = None
+        # True while a pickle snapshot still has items that are not back in the queue
+        self.restoring = False
         self.logger = logging.getLogger(__name__)
 
     def save_queue_periodically(self, shutdown_flag: threading.Event):
+        # With a durable backend every message is already on disk; this only bounds the "interval" fsync lag.
+        # Snapshots are also the fallback when the log or database could not be opened.
+        durable = self.log is not None or isinstance(self.queue, SqliteQueue)
+        interval = self.config.fsync_interval if durable else 30
+        self.restore_queue(shutdown_flag, interval)
         while not shutdown_flag.is_set():
             self.save_queue()
-            if shutdown_flag.wait(30):
+            if shutdown_flag.wait(interval):
                 break
 
     def save_queue(self):
         try:
+            if self.log is not None:
+                self.log.sync()
+                return
+            if isinstance(self.queue, SqliteQueue):
+                return
+            if self.spills():
+                return
+            if self.restoring:
+                # A snapshot now would overwrite the backlog that has not been read back yet
+                return
             with self.queue.mutex:
                 queue_contents = list(self.queue.queue)
             save_to_file(queue_contents, self.queue_file_path)
@@ -25,16 +68,75 @@ class QueueManager:
         except Exception as e:
             self.logger.error(f"Error saving queue: {e}")
 
+    def spills(self) -> bool:
+        # Spill files only relieve memory; snapshotting them would load the spilled backlog under the queue lock
+        return isinstance(self.queue.queue, SpillingLanes)
+
     def load_queue(self) -> None:
+        # Only what is needed to accept new messages; the backlog is read back later by restore_queue
+        if self.config.backend == "wal" and self.load_log():
+            return
+        if isinstance(self.queue, SqliteQueue):
+            self.logger.info(f"Queue database opened at {self.config.path}, {self.queue.qsize()} pending items")
+            return
+        if self.spills():
+            self.logger.error("Queue spills to disk but its log or database could not be opened: pending messages are not persisted")
+            return
+        self.restoring = os.path.exists(self.queue_file_path)
+        if not self.restoring:
+            self.logger.warning(f"File {self.queue_file_path} not found. Starting with an empty queue.")
+
+    def load_log(self) -> bool:
+        try:
+            self.log = WriteAheadLog(self.config.path, self.config.segment_size, self.config.fsync, self.config.fsync_interval,
+                                     **item_codec(self.config.codec))
+            pending = self.log.scan()
+            self.queue.attach_log(self.log)
+            self.logger.info(f"Queue log opened at {self.config.path}, {pending} pending items to restore")
+        except Exception as e:
+            self.logger.error(f"Error opening queue log, falling back to periodic snapshots: {e}")
+            self.log = None
+            return False
+        return True
+
+    def wait_for_room(self, shutdown_flag: threading.Event, interval: float) -> None:
+        # Restored messages are handed over as the publisher drains the queue, not all at once
+        while not shutdown_flag.is_set() and self.queue.qsize() >= self.config.restore_chunk:
+            with self.queue.not_full:
+                self.queue.not_full.wait(interval)
+            self.save_queue()
+
+    def restore_queue(self, shutdown_flag: threading.Event, interval: float = 1.0) -> None:
+        started = time.monotonic()
+        restored = 0
+        if self.log is not None:
+            while self.log.unrestored_count and not shutdown_flag.is_set():
+                self.wait_for_room(shutdown_flag, interval)
+                items = self.log.restore_chunk(self.config.restore_chunk)
+                self.queue.restore(items)
+                restored += len(items)
+        elif self.restoring:
+            # The whole snapshot is in memory once loaded, so it goes back in one pass. Waiting for the
+            # publisher to drain would hold off every snapshot, and so every new event, through an outage.
+            for item in self.load_snapshot():
+                if shutdown_flag.is_set():
+                    # The snapshot file is still intact, so nothing is lost
+                    return
+                self.queue.put(item)
+                restored += 1
+            self.restoring = False
+        if restored:
+            self.logger.info(f"Restored {restored} queued items in {time.monotonic() - started:.1f} s")
+        if self.log is not None or isinstance(self.queue, SqliteQueue):
+            self.migrate_snapshot()
+
+    def load_snapshot(self) -> List[Any]:
         try:
             items = load_from_file(self.queue_file_path)
             if not isinstance(items, list):
                 raise TypeError("Loaded data is not a list")
-            
-            for item in items:
-                self.queue.put(item)
-            
-            self.logger.info(f"Queue loaded from {self.queue_file_path}, {len(items)} items added")
+            self.logger.info(f"Queue loaded from {self.queue_file_path}, {len(items)} items to restore")
+            return items
         except FileNotFoundError:
             self.logger.warning(f"File {self.queue_file_path} not found. Starting with an empty queue.")
         except EOFError:
@@ -42,4 +144,24 @@ class QueueManager:
         except (pickle.UnpicklingError, AttributeError, TypeError) as e:
             self.logger.error(f"Error unpickling queue data: {e}")
         except Exception as e:
-            self.logger.error(f"Unexpected error loading queue: {e}")
\ No newline at end of file
+            self.logger.error(f"Unexpected error loading queue: {e}")
+        return []
+
+    def migrate_snapshot(self) -> None:
+        # A snapshot left by the pickle backend is replayed through the log once and then retired
+        if not os.path.exists(self.queue_file_path):
+            return
+        try:
+            items = load_from_file(self.queue_file_path)
+            for item in items if isinstance(items, list) else []:
+                self.queue.put(item)
+            os.replace(self.queue_file_path, self.queue_file_path + ".migrated")
+            self.logger.info(f"Moved {len(items)} items from {self.queue_file_path} into the queue log")
+        except Exception as e:
+            self.logger.error(f"Error migrating queue snapshot: {e}")
+
+    def close(self) -> None:
+        if self.log is not None:
+            self.log.close()
+        if isinstance(self.queue, SqliteQueue):
+            self.queue.close()
@@ -33,6 +33,8 @@ class RelayController:
     def relay_control(self, shutdown_flag: threading.Event):
         if not self.is_raspberry_pi:
             logging.info("Relay control is disabled as this is not a Raspberry Pi.")
+            # Returning would have the thread manager restart this thread every few seconds
+            shutdown_flag.wait()
             return
 
         while not shutdown_flag.is_set():
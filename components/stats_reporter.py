@@ -0,0 +1,21 @@
+import logging
+import threading
+from typing import Callable, List
+
+
+class StatsReporter:
+    def __init__(self, interval: int):
+        self.interval = interval
+        self.sources: List[Callable[[], str]] = []
+        self.logger = logging.getLogger(__name__)
+
+    def register(self, source: Callable[[], str]) -> None:
+        self.sources.append(source)
+
+    def report_periodically(self, shutdown_flag: threading.Event) -> None:
+        while not shutdown_flag.wait(self.interval):
+            for source in self.sources:
+                try:
+                    self.logger.info(source())
+                except Exception as e:
+                    self.logger.error(f"Error collecting statistics: {e}")
@@ -1,27 +1,35 @@
 import logging
 import time
 import threading
-from typing import List, Union, Callable, Dict
+from typing import List, Union, Callable, Dict, Tuple
 
 class ThreadManager:
     def __init__(self):
         self.threads: Dict[str, threading.Thread] = {}
         self.shutdown_flags: Dict[str, threading.Event] = {}
+        # Thread drops its _target once run() returns, so a dead thread can only be restarted from here
+        self.targets: Dict[str, Callable] = {}
         self.logger: logging.Logger = logging.getLogger(__name__)
 
-    def start_threads(self, thread_configs: List[Union[threading.Thread, Callable]]):
+    def start_threads(self, thread_configs: List[Union[threading.Thread, Callable, Tuple[str, Callable]]]):
         for config in thread_configs:
             self.start_thread(config)
 
-    def start_thread(self, thread_config: Union[threading.Thread, Callable]):
+    def start_thread(self, thread_config: Union[threading.Thread, Callable, Tuple[str, Callable]]):
         if isinstance(thread_config, threading.Thread):
             thread = thread_config
             thread_name = thread.name
+            self.targets[thread_name] = thread._target
         else:
-            thread_name = thread_config.__name__
+            # A (name, target) pair lets several instances of the same method run side by side
+            if isinstance(thread_config, tuple):
+                thread_name, target = thread_config
+            else:
+                thread_name, target = thread_config.__name__, thread_config
             shutdown_flag = threading.Event()
-            thread = threading.Thread(target=thread_config, args=(shutdown_flag,), name=thread_name)
+            thread = threading.Thread(target=target, args=(shutdown_flag,), name=thread_name)
             self.shutdown_flags[thread_name] = shutdown_flag
+            self.targets[thread_name] = target
 
         if thread_name in self.threads:
             self.restart_thread(thread_name, thread)
@@ -36,7 +44,7 @@ class ThreadManager:
         
         new_shutdown_flag = threading.Event()
         self.shutdown_flags[thread_name] = new_shutdown_flag
-        new_thread = threading.Thread(target=new_thread._target, args=(new_shutdown_flag,), name=thread_name)
+        new_thread = threading.Thread(target=self.targets[thread_name], args=(new_shutdown_flag,), name=thread_name)
         
         new_thread.daemon = True
         new_thread.start()
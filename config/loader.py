@@ -1,6 +1,6 @@
 import yaml
 from typing import Dict, Any
-from .schema import ConfigSchema
+from .schema import ConfigSchema, PanelGrammarConfig
 
 def load_yaml(file_path: str) -> Dict[str, Any]:
     with open(file_path, 'r') as file:
@@ -11,4 +11,8 @@ def load_and_validate_config(config_path: str) -> ConfigSchema:
     return ConfigSchema(**config_data)
 
 def load_event_severity_levels(file_path: str) -> Dict[int, Dict[str, int]]:
-    return load_yaml(file_path)
\ No newline at end of file
+    return load_yaml(file_path)
+
+def load_panel_grammars(file_path: str) -> Dict[int, PanelGrammarConfig]:
+    grammar_data = load_yaml(file_path) or {}
+    return {int(panel_id): PanelGrammarConfig(**grammar) for panel_id, grammar in grammar_data.items()}
@@ -1,12 +1,23 @@
 from pydantic import BaseModel
+from typing import Dict, List, Literal, Optional
 
 class ThingsboardConfig(BaseModel):
     device_token: str
     host: str
     port: int
+    # Reconnect attempts back off exponentially from min to max delay, each wait randomized between half and all of it
+    reconnect_min_delay: float = 0.5
+    reconnect_max_delay: float = 60.0
+    # An attempt without CONNACK after this many seconds counts as failed
+    connect_timeout: float = 10.0
 
 class SerialConfig(BaseModel):
     puerto: str
+    # "select" blocks until bytes arrive, "poll" keeps the legacy in_waiting/sleep loop
+    read_mode: Literal["select", "poll"] = "select"
+    poll_interval: float = 0.1
+    # Upper bound on how long an idle reader waits before re-checking the shutdown flag
+    idle_wakeup_interval: float = 0.5
 
 class RelayConfig(BaseModel):
     pin: int
@@ -16,13 +27,152 @@ class RelayConfig(BaseModel):
 class RelayMonitorConfig(BaseModel):
     alarm_pin: int
     trouble_pin: int
-    publish_interval: int
     alarm_active_high: bool
     trouble_active_high: bool
+    # "interrupt" wakes on GPIO edges, "sample" reads the pins every sample_interval seconds
+    detection: Literal["interrupt", "sample"] = "interrupt"
+    sample_interval: float = 0.01
+    # Seconds a new relay level must hold before it is published
+    debounce: float = 0.05
+    # Changes are published at once; both states are also repeated every heartbeat_interval seconds
+    heartbeat_interval: float = 300
+    # "auto" uses RPi.GPIO and disables relay monitoring when it is not available; "simulated" is for tools and tests
+    gpio_backend: Literal["auto", "rpi", "simulated"] = "auto"
+
+class PanelPortConfig(BaseModel):
+    puerto: str
+    id_modelo_panel: int
+    # Added to every message as "source" so events from different panels can be told apart
+    name: Optional[str] = None
+
+class ReportConfig(BaseModel):
+    enabled: bool = True
+    # A report chunk is published once it reaches either limit
+    batch_lines: int = 25
+    batch_bytes: int = 2048
+
+class CoalesceConfig(BaseModel):
+    # Repeats of the same event ID and description within window seconds become one message with a count
+    enabled: bool = False
+    window: float = 10.0
+    # Events at or above this severity are never held back
+    pass_severity: int = 3
+    max_bursts: int = 1024
+
+class JournalConfig(BaseModel):
+    # Raw serial bytes kept in a fixed-size ring on disk, one directory per port
+    enabled: bool = False
+    directory: str = "journal"
+    segment_size: int = 1048576
+    segments: int = 8
+    flush_interval: float = 10
+
+class QueueConfig(BaseModel):
+    # "wal" logs every message at enqueue, "sqlite" keeps pending messages in a database
+    # instead of RAM, "pickle" keeps the legacy 30 s snapshots
+    backend: Literal["wal", "sqlite", "pickle"] = "wal"
+    path: str = "queue_wal"
+    segment_size: int = 4194304
+    # "always" syncs every enqueue, "interval" at most every fsync_interval seconds
+    fsync: Literal["always", "interval", "never"] = "always"
+    fsync_interval: float = 1.0
+    # Rows the sqlite backend moves to memory per dequeue transaction
+    prefetch: int = 64
+    # binary: compact encoding of parsed events in the log, database and spill files; pickle: previous format
+    codec: Literal["binary", "pickle"] = "binary"
+    # The wal backend reads persisted messages back at startup this many at a time, as the queue drains
+    restore_chunk: int = 500
+    # One lane per event severity, served by weight so alarms overtake a backlog; false keeps strict FIFO
+    priority_lanes: bool = True
+    lane_weights: Dict[int, int] = {3: 16, 2: 4, 1: 2, 0: 1}
+    # Lane for messages without a severity, such as reports and attributes
+    default_lane: int = 1
+    # Messages the wal backend keeps in RAM before spilling to compressed files; 0 is unbounded (always with pickle)
+    memory_items: int = 0
+    spill_path: str = "queue_spill"
+    spill_segment_items: int = 1000
+    disk_bytes: int = 268435456
+    # What goes when spilled messages reach disk_bytes: the oldest of the least severe lane, or the newest
+    overflow: Literal["drop_oldest", "drop_newest"] = "drop_oldest"
+
+class RateLimitConfig(BaseModel):
+    messages: int
+    period: float
+
+class PublishConfig(BaseModel):
+    # Up to batch_size queued telemetry messages (and at most batch_bytes of JSON) go out as one
+    # ThingsBoard message with a ts per entry; 1 publishes every message on its own
+    batch_size: int = 1
+    batch_bytes: int = 65536
+    # QoS1 publishes sent before the oldest is acknowledged; a publish without PUBACK after ack_timeout is retried
+    inflight_window: int = 16
+    ack_timeout: float = 10.0
+    # An idle publisher wakes on every enqueue; this only bounds how long it sleeps otherwise
+    idle_timeout: float = 5.0
+    # ThingsBoard API limits; every one of them must allow a send
+    rate_limits: List[RateLimitConfig] = [RateLimitConfig(messages=100, period=1), RateLimitConfig(messages=3000, period=60),
+                                          RateLimitConfig(messages=7000, period=3600)]
 
 class ConfigSchema(BaseModel):
     thingsboard: ThingsboardConfig
     serial: SerialConfig
     relay: RelayConfig
     relay_monitor: RelayMonitorConfig
-    id_modelo_panel: int
\ No newline at end of file
+    id_modelo_panel: int
+    # Extra panels read by this same process; when empty only serial.puerto is used
+    panels: List[PanelPortConfig] = []
+    reports: ReportConfig = ReportConfig()
+    journal: JournalConfig = JournalConfig()
+    coalesce: CoalesceConfig = CoalesceConfig()
+    queue: QueueConfig = QueueConfig()
+    publish: PublishConfig = PublishConfig()
+    stats_interval: int = 300
+    # serial_first opens the serial ports before the MQTT client and GPIO are even imported, and
+    # connects in the background; eager sets both up first, as before
+    startup: Literal["serial_first", "eager"] = "serial_first"
+
+class PanelSerialConfig(BaseModel):
+    baudrate: int = 9600
+    bytesize: int = 8
+    parity: Literal["none", "even", "odd"] = "none"
+    stopbits: int = 1
+    xonxoff: bool = False
+    timeout: float = 1
+
+class PanelFramingConfig(BaseModel):
+    # blank_line: events end on an empty line; line: every line is an event;
+    # split: events are cut out of each line with event_start
+    mode: Literal["blank_line", "line", "split"] = "blank_line"
+    # Without a report_delimiter the panel has no reports and every block is an event
+    report_delimiter: Optional[str] = None
+    max_report_delimiter_count: int = -1
+    end_report_delimiter: Optional[str] = None
+    event_start: Optional[str] = None
+    line_separator: str = "\r"
+
+class PanelFieldSpec(BaseModel):
+    group: Optional[str] = None
+    columns: Optional[str] = None
+    line: Optional[int] = None
+    value: Optional[str] = None
+    join: str = " "
+    tokenize: bool = False
+
+class PanelRuleConfig(BaseModel):
+    header_line: int = 0
+    line_count: Optional[int] = None
+    match: Optional[str] = None
+    split: Optional[str] = None
+    min_columns: int = 1
+    max_columns: Optional[int] = None
+    event: PanelFieldSpec
+    description: PanelFieldSpec = PanelFieldSpec(value="")
+    facp_date: PanelFieldSpec = PanelFieldSpec(value="")
+    continuation: Optional[str] = "\n"
+    severity: Optional[int] = None
+
+class PanelGrammarConfig(BaseModel):
+    name: str
+    serial: PanelSerialConfig = PanelSerialConfig()
+    framing: PanelFramingConfig = PanelFramingConfig()
+    rules: List[PanelRuleConfig]
@@ -1,9 +1,17 @@
+import time
+# Taken before any other import so the boot timeline includes import time
+BOOT_STARTED = time.monotonic()
+
 import os
-from config.loader import load_and_validate_config, load_event_severity_levels
+from app_utils.boot_timeline import BootTimeline
+from config.loader import load_and_validate_config, load_event_severity_levels, load_panel_grammars
 from logging_setup import setup_logging
 from app.core import Application
 
 def main():
+    timeline = BootTimeline(BOOT_STARTED)
+    timeline.mark("imports")
+
     # Get the directory of the current script
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
@@ -14,10 +22,12 @@ def main():
     # Load configurations
     config = load_and_validate_config(os.path.join(current_dir, "config", "config.yml"))
     event_severity_levels = load_event_severity_levels(os.path.join(current_dir, "config", "eventSeverityLevels.yml"))
+    panel_grammars = load_panel_grammars(os.path.join(current_dir, "config", "panelGrammars.yml"))
+    timeline.mark("config loaded")
 
     # Initialize and run the application
-    app = Application(config, event_severity_levels)
+    app = Application(config, event_severity_levels, panel_grammars, timeline)
     app.start()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,84 @@
+import time
+# The child process measures its own imports, so nothing else may be imported before this
+BOOT_STARTED = time.monotonic()
+
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import tty
+from typing import Dict, List
+
+
+def child(startup: str, puerto: str, port: int, workdir: str) -> None:
+    from app_utils.boot_timeline import BootTimeline
+    from tools.common import PROJECT_ROOT, make_config
+    from app.core import Application
+    from config.loader import load_event_severity_levels, load_panel_grammars
+
+    timeline = BootTimeline(BOOT_STARTED)
+    timeline.mark("imports")
+    config = make_config(puerto, 10001)
+    config.thingsboard.host = "127.0.0.1"
+    config.thingsboard.port = port
+    config.queue.path = os.path.join(workdir, "queue_wal")
+    config.startup = startup
+    app = Application(
+        config,
+        load_event_severity_levels(os.path.join(PROJECT_ROOT, "config", "eventSeverityLevels.yml")),
+        load_panel_grammars(os.path.join(PROJECT_ROOT, "config", "panelGrammars.yml")),
+        timeline
+    )
+    timeline.mark("config loaded")
+    threading.Thread(target=app.start, name="application", daemon=True).start()
+    deadline = time.monotonic() + 30
+    while len(timeline.marks) < 6 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    print(" ".join(f"{name.replace(' ', '_')}={elapsed * 1000:.1f}" for name, elapsed in timeline.marks), flush=True)
+    os._exit(0)
+
+
+def measure(startup: str, runs: int) -> Dict[str, List[float]]:
+    from tools.stub_broker import StubBroker
+
+    broker = StubBroker()
+    broker.start()
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        workdir = tempfile.mkdtemp(prefix="boot-")
+        output = subprocess.run([sys.executable, "-m", "tools.bench_boot", "--child", startup, os.ttyname(slave),
+                                 str(broker.port), workdir], capture_output=True, text=True, timeout=60,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+        os.close(master)
+        os.close(slave)
+        for field in output.split():
+            name, value = field.split("=")
+            samples.setdefault(name, []).append(float(value))
+    broker.stop()
+    return samples
+
+
+def main():
+    if len(sys.argv) == 6 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], int(sys.argv[4]), sys.argv[5])
+        return
+    parser = argparse.ArgumentParser(description="Boot timeline of a fresh process: serial-first startup vs eager MQTT/GPIO setup.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["eager", "serial_first"], choices=["eager", "serial_first"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    for startup in args.modes:
+        samples = measure(startup, args.runs)
+        # Medians, in ms since the process started importing
+        line = ", ".join(f"{name.replace('_', ' ')} {sorted(values)[len(values) // 2]:.0f} ms" for name, values in samples.items())
+        print(f"{startup:12} {line}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import pickle
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from tools.bench_queue import parsed_events
+from classes.event_record import decode_item, encode_item
+
+
+def as_dicts(events: List[Any]) -> List[Any]:
+    # The message format before event records: a plain dict per event
+    return [(publish_type, dict(message.items())) for publish_type, message in events]
+
+
+def best_rate(action: Callable[[], Any], count: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        action()
+        best = min(best, time.perf_counter() - started)
+    return count / best
+
+
+def held_bytes(build: Callable[[], List[Any]]) -> float:
+    tracemalloc.start()
+    try:
+        items = build()
+        held = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return held / max(len(items), 1)
+
+
+def bench_codec(events: List[Any], encode: Callable[[Any], bytes], decode: Callable[[bytes], Any], repeat: int,
+                copy: Callable[[List[Any]], List[Any]]) -> Dict[str, float]:
+    encoded = [encode(item) for item in events]
+    return {
+        "ram_bytes": held_bytes(lambda: copy(events)),
+        "disk_bytes": sum(len(data) for data in encoded) / len(encoded),
+        "encode_per_sec": best_rate(lambda: [encode(item) for item in events], len(events), repeat),
+        "decode_per_sec": best_rate(lambda: [decode(data) for data in encoded], len(encoded), repeat)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per queued event and encode/decode rate: pickled dicts vs event records.")
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--model", type=int, default=10002, help="Panel model whose parsed events are encoded")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    records = parsed_events(args.model, args.events)
+    dicts = as_dicts(records)
+    print(f"{len(records)} events of model {args.model}")
+    print(f"{'format':16} {'RAM B/event':>12} {'disk B/event':>13} {'encode/s':>10} {'decode/s':>10}")
+    formats = (
+        ("dict + pickle", dicts, lambda item: pickle.dumps(item), pickle.loads,
+         lambda items: [(publish_type, dict(message)) for publish_type, message in items]),
+        ("record + binary", records, encode_item, decode_item,
+         lambda items: [(publish_type, message.copy()) for publish_type, message in items])
+    )
+    for name, events, encode, decode, copy in formats:
+        result = bench_codec(events, encode, decode, args.repeat, copy)
+        print(f"{name:16} {result['ram_bytes']:>12.0f} {result['disk_bytes']:>13.0f} "
+              f"{result['encode_per_sec']:>10.0f} {result['decode_per_sec']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+from tools.common import PROJECT_ROOT, make_config, percentile
+from tools.fake_serial import FakeSerial
+from tools.panel_captures import PANEL_FORMATS, synthetic_capture
+from app_utils.queue_operations import SafeQueue
+from classes.specific_serial_handler import Edwards_iO1000, Edwards_EST3x, Notifier_NFS, Simplex
+from config.loader import load_event_severity_levels
+
+HANDLERS = {
+    10001: Edwards_iO1000,
+    10002: Edwards_EST3x,
+    10003: Notifier_NFS,
+    10004: Simplex
+}
+
+
+def run_pass(panel_id: int, capture: bytes, chunk_size: int, severity_levels: Dict[str, int],
+             trace_latency: bool = False) -> Tuple[SafeQueue, float, List[float], int]:
+    shutdown_flag = threading.Event()
+    queue = SafeQueue()
+    handler = HANDLERS[panel_id](make_config(id_modelo_panel=panel_id), severity_levels, queue)
+    handler.ser = FakeSerial(capture, shutdown_flag, chunk_size)
+
+    latencies: List[float] = []
+    if trace_latency:
+        publish = handler.publish_parsed_event
+
+        def timed_publish(buffer: str) -> None:
+            started = time.perf_counter()
+            publish(buffer)
+            latencies.append(time.perf_counter() - started)
+
+        handler.publish_parsed_event = timed_publish
+
+    started = time.perf_counter()
+    handler.process_incoming_data(shutdown_flag)
+    elapsed = time.perf_counter() - started
+    # Parsed events only: the queue also holds report chunks and attribute messages
+    return queue, elapsed, latencies, handler.statistics.events
+
+
+def measure_allocations(panel_id: int, capture: bytes, chunk_size: int, severity_levels: Dict[str, int]) -> Tuple[float, float]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        # Keep the queue alive so the snapshot includes what each queued event costs
+        queue, _, _, events = run_pass(panel_id, capture, chunk_size, severity_levels)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocated_blocks = sum(stat.count_diff for stat in after.compare_to(before, "lineno") if stat.count_diff > 0)
+    events = max(events, 1)
+    return allocated_blocks / events, peak / events
+
+
+def benchmark(panel_id: int, capture: bytes, chunk_size: int, repeat: int, severity_levels: Dict[str, int]) -> Dict[str, float]:
+    best_rate = 0.0
+    events = 0
+    for _ in range(repeat):
+        _, elapsed, _, events = run_pass(panel_id, capture, chunk_size, severity_levels)
+        best_rate = max(best_rate, events / elapsed if elapsed else 0.0)
+    _, _, latencies, _ = run_pass(panel_id, capture, chunk_size, severity_levels, trace_latency=True)
+    blocks_per_event, peak_bytes_per_event = measure_allocations(panel_id, capture, chunk_size, severity_levels)
+    return {
+        "events": events,
+        "events_per_sec": best_rate,
+        "p50_us": percentile(latencies, 50) * 1e6,
+        "p95_us": percentile(latencies, 95) * 1e6,
+        "p99_us": percentile(latencies, 99) * 1e6,
+        "blocks_per_event": blocks_per_event,
+        "peak_bytes_per_event": peak_bytes_per_event
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure parser throughput of every panel handler through process_incoming_data.")
+    parser.add_argument("--events", type=int, default=5000, help="Synthetic events per panel")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Bytes the fake port reports in in_waiting per read")
+    parser.add_argument("--repeat", type=int, default=3, help="Throughput passes per panel, the best one is reported")
+    parser.add_argument("--report-every", type=int, default=0, help="Insert a status report every N events (Edwards panels)")
+    parser.add_argument("--capture", action="append", default=[], metavar="MODEL=PATH",
+                        help="Use a recorded raw capture for a panel model instead of synthetic data")
+    parser.add_argument("--panels", nargs="+", type=int, default=list(HANDLERS))
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a saved JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop against the baseline")
+    parser.add_argument("--log-level", default="ERROR", help="Handler log level; INFO includes the per-event log line cost")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+    captures = {int(model): path for model, path in (entry.split("=", 1) for entry in args.capture)}
+    severity_levels = load_event_severity_levels(f"{PROJECT_ROOT}/config/eventSeverityLevels.yml")
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'panel':16} {'events':>7} {'events/s':>10} {'p50 us':>8} {'p95 us':>8} {'p99 us':>8} {'blocks/ev':>10} {'peak B/ev':>10}")
+    for panel_id in args.panels:
+        if panel_id in captures:
+            with open(captures[panel_id], 'rb') as capture_file:
+                capture = capture_file.read()
+        else:
+            capture = synthetic_capture(panel_id, args.events, report_every=args.report_every)
+        name = PANEL_FORMATS[panel_id][0]
+        result = benchmark(panel_id, capture, args.chunk_size, args.repeat, severity_levels.get(panel_id, {}))
+        results[name] = result
+        print(f"{name:16} {result['events']:>7} {result['events_per_sec']:>10.0f} {result['p50_us']:>8.1f} "
+              f"{result['p95_us']:>8.1f} {result['p99_us']:>8.1f} {result['blocks_per_event']:>10.2f} "
+              f"{result['peak_bytes_per_event']:>10.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = [
+            f"{name}: {result['events_per_sec']:.0f} events/s vs {baseline[name]['events_per_sec']:.0f} in baseline"
+            for name, result in results.items()
+            if name in baseline and result['events_per_sec'] < baseline[name]['events_per_sec'] * (1 - args.tolerance)
+        ]
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import argparse
+from typing import Dict, List
+
+from tools.common import format_latency_ms
+from app_utils.queue_operations import SafeQueue
+from classes.enums import PublishType
+
+
+def simulate(priority_lanes: bool, backlog: int, rate: float, alarm_every: float, alarms: int) -> Dict[str, object]:
+    # Simulated clock: each dequeue is one publish at the ThingsBoard rate limit
+    queue = SafeQueue(priority_lanes=priority_lanes)
+    for index in range(backlog):
+        queue.put((PublishType.TELEMETRY, {"event": "TROUBLE", "severity": index % 3, "queued_at": 0.0}))
+
+    clock = 0.0
+    next_alarm = alarm_every
+    injected = 0
+    alarm_latencies: List[float] = []
+    drained_at: Dict[int, float] = {}
+    while queue.qsize() or injected < alarms:
+        while injected < alarms and next_alarm <= clock:
+            queue.put((PublishType.TELEMETRY, {"event": "ALARM", "severity": 3, "queued_at": next_alarm}))
+            injected += 1
+            next_alarm += alarm_every
+        if not queue.qsize():
+            clock = next_alarm
+            continue
+        _, message = queue.get()
+        clock += 1 / rate
+        if message["severity"] == 3:
+            alarm_latencies.append(clock - message["queued_at"])
+        else:
+            drained_at[message["severity"]] = clock
+    return {"alarm_latencies": alarm_latencies, "drained_at": drained_at}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-publish of new alarms while a backlog drains, FIFO vs severity lanes.")
+    parser.add_argument("--backlog", type=int, default=20000, help="Queued severity 0-2 events when publishing resumes")
+    parser.add_argument("--rate", type=float, default=100, help="Publishes per second (the ThingsBoard per-second limit)")
+    parser.add_argument("--alarm-every", type=float, default=5, help="Seconds between new alarms during the drain")
+    parser.add_argument("--alarms", type=int, default=40)
+    args = parser.parse_args()
+
+    print(f"backlog={args.backlog} rate={args.rate:g}/s, one alarm every {args.alarm_every:g}s ({args.alarms} alarms)")
+    for name, priority_lanes in (("fifo", False), ("lanes", True)):
+        result = simulate(priority_lanes, args.backlog, args.rate, args.alarm_every, args.alarms)
+        drained = " ".join(f"sev{severity}={seconds:.0f}s" for severity, seconds in sorted(result["drained_at"].items()))
+        print(f"{name:6} alarm time-to-publish {format_latency_ms(result['alarm_latencies'])}; backlog last published at {drained}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from tb_device_mqtt import TBPublishInfo
+
+from tools.bench_queue import parsed_events
+from tools.common import make_config
+import classes.mqtt_sender as mqtt_sender
+from app_utils.queue_operations import SafeQueue
+from classes.mqtt_sender import MqttHandler
+
+
+class SimulatedClock:
+    # Stands in for the time module inside mqtt_sender, so hours of rate-limited draining run in seconds
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def monotonic_ns(self) -> int:
+        return int(self.now * 1e9)
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class SimulatedEvent(threading.Event):
+    # The handler's shutdown flag: waiting on it, as the rate limiter does, passes simulated time
+    def __init__(self, clock: SimulatedClock):
+        super().__init__()
+        self.clock = clock
+
+    def wait(self, timeout: float | None = None) -> bool:
+        if not self.is_set():
+            self.clock.sleep(timeout or 0)
+        return self.is_set()
+
+
+class SimulatedQueue(SafeQueue):
+    # Waiting on an empty queue passes simulated time, otherwise an outstanding PUBACK would never arrive
+    def __init__(self, clock: SimulatedClock):
+        super().__init__()
+        self.clock = clock
+
+    def wait_not_empty(self, timeout: float | None = None) -> bool:
+        if not self.qsize():
+            self.clock.sleep(timeout or 0)
+        return bool(self.qsize())
+
+
+class PublishResult:
+    # Plays both the TBPublishInfo and the MQTTMessageInfo inside it; the PUBACK arrives rtt after the send
+    def __init__(self, client: "RecordingClient", entries: int):
+        self.message_info = self
+        self.client = client
+        self.entries = entries
+        self.acked_at = client.clock() + client.rtt
+        self.acked = False
+
+    def rc(self) -> int:
+        return TBPublishInfo.TB_ERR_SUCCESS
+
+    def is_published(self) -> bool:
+        if not self.acked and self.client.clock() >= self.acked_at:
+            self.acked = True
+            self.client.acked(self.entries)
+        return self.acked
+
+
+class RecordingClient:
+    def __init__(self, expected: int, done: threading.Event, clock: Callable[[], float] = time.monotonic, rtt: float = 0.0):
+        self.is_connected = True
+        self.expected = expected
+        self.done = done
+        self.clock = clock
+        self.rtt = rtt
+        self.messages = 0
+        self.entries = 0
+        self.acked_entries = 0
+        self.done_at = 0.0
+
+    def connect(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        pass
+
+    def acked(self, entries: int) -> None:
+        self.acked_entries += entries
+        if self.acked_entries >= self.expected and not self.done.is_set():
+            self.done_at = self.clock()
+            self.done.set()
+
+    def send_telemetry(self, telemetry: Any) -> PublishResult:
+        entries = len(telemetry) if isinstance(telemetry, list) else 1
+        self.messages += 1
+        self.entries += entries
+        return PublishResult(self, entries)
+
+    def send_attributes(self, attributes: Dict[str, Any]) -> PublishResult:
+        self.messages += 1
+        return PublishResult(self, 0)
+
+
+def drain(events: List[Any], batch_size: int, batch_bytes: int, window: int, rtt: float) -> Dict[str, float]:
+    config = make_config()
+    config.publish.batch_size = batch_size
+    config.publish.batch_bytes = batch_bytes
+    config.publish.inflight_window = window
+    clock = SimulatedClock()
+    queue = SimulatedQueue(clock)
+    for publish_type, message in events:
+        queue.put((publish_type, message.copy()))
+
+    done = SimulatedEvent(clock)
+    client = RecordingClient(len(events), done, clock.monotonic, rtt)
+    real_time = mqtt_sender.time
+    mqtt_sender.time = clock
+    try:
+        handler = MqttHandler(config, queue, client)
+        handler.shutdown_flag = done
+        handler.process_queue()
+    finally:
+        mqtt_sender.time = real_time
+    return {"seconds": client.done_at, "messages": client.messages, "entries": client.entries}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated time to drain a queued backlog through MqttHandler at the API limits.")
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--model", type=int, default=10002, help="Panel model whose parsed events are queued")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 25, 100])
+    parser.add_argument("--batch-bytes", type=int, default=65536)
+    parser.add_argument("--windows", type=int, nargs="+", default=[1, 16], help="publish.inflight_window values")
+    parser.add_argument("--rtt", type=float, default=0.3, help="Seconds from publish to PUBACK, e.g. 0.3 on a cellular link")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    events = parsed_events(args.model, args.events)
+    limits = ", ".join(f"{limit.messages}/{limit.period:g}s" for limit in make_config().publish.rate_limits)
+    print(f"{len(events)} queued events, limits {limits}, rtt {args.rtt * 1000:.0f} ms")
+    print(f"{'batch':>6} {'window':>7} {'drain s':>9} {'MQTT messages':>14} {'events/s':>9}")
+    for batch_size, window in ((batch_size, window) for batch_size in args.batch_sizes for window in args.windows):
+        result = drain(events, batch_size, args.batch_bytes, window, args.rtt)
+        # A drain that fits the limits' burst allowance takes no simulated time at all
+        rate = f"{result['entries'] / result['seconds']:>9.0f}" if result["seconds"] >= 0.001 else f"{'burst':>9}"
+        print(f"{batch_size:>6} {window:>7} {result['seconds']:>9.1f} {result['messages']:>14} {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import tracemalloc
+from queue import Empty
+from typing import Any, Callable, Dict, List, Tuple
+
+from tools.bench_parsers import run_pass
+from tools.panel_captures import synthetic_capture
+from app_utils.queue_operations import SafeQueue
+from components.queue_manager import QueueManager, create_queue
+from config.schema import QueueConfig
+
+
+def parsed_events(panel_id: int, count: int) -> List[Tuple[Any, Dict[str, Any]]]:
+    queue, _, _, _ = run_pass(panel_id, synthetic_capture(panel_id, count), 256, {})
+    return list(queue.queue)
+
+
+def open_backend(config: QueueConfig, snapshot: str) -> Tuple[SafeQueue, QueueManager]:
+    queue = create_queue(config)
+    manager = QueueManager(queue, snapshot, config)
+    manager.load_queue()
+    return queue, manager
+
+
+def timed(action: Callable[[], Any]) -> Tuple[Any, float]:
+    started = time.perf_counter()
+    result = action()
+    return result, time.perf_counter() - started
+
+
+def directory_size(path: str) -> int:
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def bench_backend(backend: str, events: List[Tuple[Any, Dict[str, Any]]], workdir: str, fsync: str,
+                  memory_items: int = 0, measure_memory: bool = False) -> Dict[str, float]:
+    path = os.path.join(workdir, backend, "queue.db" if backend == "sqlite" else "wal")
+    snapshot = os.path.join(workdir, backend, "queue_backup.pkl")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    config = QueueConfig(backend=backend, path=path, fsync=fsync, memory_items=memory_items,
+                         spill_path=os.path.join(workdir, backend, "spill"))
+
+    queue, manager = open_backend(config, snapshot)
+    if measure_memory:
+        # Slows the enqueue pass down, so the rate is only comparable between runs with the same flag
+        tracemalloc.start()
+    _, enqueue_time = timed(lambda: [queue.put((publish_type, message.copy())) for publish_type, message in events])
+    queued_memory = tracemalloc.get_traced_memory()[0] if measure_memory else 0
+    tracemalloc.stop()
+    # The pickle backend is only durable after a snapshot of the whole queue
+    _, persist_time = timed(manager.save_queue)
+    disk_bytes = directory_size(snapshot if backend == "pickle" else path)
+    manager.close()
+
+    # Restart is only the part the service waits for before reading serial; the backlog streams back while draining
+    (queue, manager), restart_time = timed(lambda: open_backend(config, snapshot))
+    restorer = threading.Thread(target=manager.restore_queue, args=(threading.Event(), 0.01))
+
+    def drain() -> int:
+        drained = 0
+        restorer.start()
+        while restorer.is_alive() or queue.qsize():
+            try:
+                _, message = queue.get(timeout=0.01)
+            except Empty:
+                continue
+            queue.ack(message)
+            drained += 1
+        return drained
+    restored, dequeue_time = timed(drain)
+    manager.close()
+    return {
+        "restored": restored,
+        "enqueue_per_sec": len(events) / enqueue_time,
+        "persist_ms": persist_time * 1000,
+        "restart_ms": restart_time * 1000,
+        "dequeue_per_sec": restored / dequeue_time if dequeue_time else 0.0,
+        "disk_bytes": disk_bytes,
+        "memory_bytes": queued_memory
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare queue persistence backends with a large pending backlog.")
+    parser.add_argument("--events", type=int, default=100000, help="Pending events to enqueue, persist and restore")
+    parser.add_argument("--model", type=int, default=10002, help="Panel model whose parsed events are queued")
+    parser.add_argument("--backends", nargs="+", default=["pickle", "wal", "sqlite"], choices=["pickle", "wal", "sqlite"])
+    parser.add_argument("--fsync", default="interval", choices=["always", "interval", "never"])
+    parser.add_argument("--memory-items", type=int, default=0, help="queue.memory_items for the wal backend")
+    parser.add_argument("--measure-memory", action="store_true", help="Trace the RAM held by the queued backlog")
+    parser.add_argument("--workdir", help="Directory for the queue files; defaults to a temporary directory")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    events = parsed_events(args.model, args.events)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench_queue_")
+    print(f"{len(events)} events, fsync={args.fsync}, memory_items={args.memory_items}, files in {workdir}")
+    print(f"{'backend':8} {'enqueue/s':>10} {'persist ms':>11} {'restart ms':>11} {'restored':>9} {'dequeue/s':>10} {'disk MB':>8} {'RAM MB':>7}")
+    try:
+        for backend in args.backends:
+            result = bench_backend(backend, events, workdir, args.fsync, args.memory_items, args.measure_memory)
+            print(f"{backend:8} {result['enqueue_per_sec']:>10.0f} {result['persist_ms']:>11.1f} {result['restart_ms']:>11.1f} "
+                  f"{result['restored']:>9} {result['dequeue_per_sec']:>10.0f} {result['disk_bytes'] / 1e6:>8.1f} "
+                  f"{result['memory_bytes'] / 1e6 if args.measure_memory else float('nan'):>7.1f}")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+from tools.common import format_latency_ms, make_config
+from classes.relay_monitor import RelayMonitor
+
+
+class RecordingHandler:
+    # Takes the place of MqttHandler: records when each relay telemetry message would go out
+    def __init__(self):
+        self.queue = self
+        self.published: List[Tuple[float, Dict[str, Any]]] = []
+        self.lock = threading.Lock()
+
+    def record(self, telemetry: Dict[str, Any]) -> None:
+        with self.lock:
+            self.published.append((time.monotonic(), dict(telemetry)))
+
+    def publish_telemetry(self, telemetry: Dict[str, Any], bypass_queue: bool = False) -> None:
+        self.record(telemetry)
+
+    def put(self, item: Tuple[Any, Dict[str, Any]], block: bool = True, timeout: float | None = None) -> None:
+        self.record(item[1])
+
+
+def legacy_loop(monitor: RelayMonitor, interval: float, shutdown_flag: threading.Event) -> None:
+    # The monitor before edge detection: both states every publish_interval, changed or not
+    while not shutdown_flag.is_set():
+        states = monitor._read_relays()
+        monitor.mqtt_handler.publish_telemetry({f"{status.lower()}_relay": active for status, active in states.items()},
+                                               bypass_queue=True)
+        if shutdown_flag.wait(interval):
+            break
+
+
+def bounce(gpio: Any, pin: int, level: int) -> None:
+    # A relay contact closing: a few millisecond flips before it settles
+    for _ in range(3):
+        gpio.set_input(pin, level)
+        time.sleep(0.001)
+        gpio.set_input(pin, 1 - level)
+        time.sleep(0.001)
+    gpio.set_input(pin, level)
+
+
+def measure(mode: str, transitions: int, gap: float, interval: float, debounce: float) -> Dict[str, Any]:
+    config = make_config()
+    config.relay_monitor.detection = "sample" if mode == "sample" else "interrupt"
+    config.relay_monitor.debounce = debounce
+    handler = RecordingHandler()
+    monitor = RelayMonitor(config, handler)
+    gpio = monitor.GPIO
+    pin = config.relay_monitor.alarm_pin
+    gpio.set_input(pin, gpio.LOW)
+
+    shutdown_flag = threading.Event()
+    target = (lambda: legacy_loop(monitor, interval, shutdown_flag)) if mode == "interval" else (lambda: monitor.monitor_relays(shutdown_flag))
+    thread = threading.Thread(target=target, daemon=True)
+    started = time.monotonic()
+    thread.start()
+    time.sleep(0.2)
+
+    latencies: List[float] = []
+    level = gpio.LOW
+    for _ in range(transitions):
+        time.sleep(random.uniform(0.5, 1.5) * gap)
+        level = 1 - level
+        bounce(gpio, pin, level)
+        settled = time.monotonic()
+        deadline = settled + interval + 2
+        while time.monotonic() < deadline:
+            with handler.lock:
+                seen = [at for at, telemetry in handler.published if at >= settled and telemetry.get("alarm_relay") == bool(level)]
+            if seen:
+                latencies.append(seen[0] - settled)
+                break
+            time.sleep(0.001)
+
+    elapsed = time.monotonic() - started
+    shutdown_flag.set()
+    thread.join(timeout=5)
+    monitor.cleanup()
+    return {"latencies": latencies, "messages": len(handler.published), "elapsed": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relay transition-to-publish latency and message count: fixed interval vs edge-triggered monitoring.")
+    parser.add_argument("--transitions", type=int, default=10)
+    parser.add_argument("--gap", type=float, default=2, help="Mean seconds between relay transitions")
+    parser.add_argument("--interval", type=float, default=15, help="publish_interval of the fixed-interval monitor")
+    parser.add_argument("--debounce", type=float, default=0.05)
+    parser.add_argument("--modes", nargs="+", default=["interval", "interrupt", "sample"], choices=["interval", "interrupt", "sample"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    for mode in args.modes:
+        result = measure(mode, args.transitions, args.gap, args.interval, args.debounce)
+        print(f"{mode:9} transitions={len(result['latencies'])}/{args.transitions} messages={result['messages']} "
+              f"in {result['elapsed']:.0f}s change->publish {format_latency_ms(result['latencies'])}")
+
+
+if __name__ == "__main__":
+    main()
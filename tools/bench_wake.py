@@ -0,0 +1,88 @@
+import argparse
+import logging
+import queue
+import random
+import resource
+import threading
+import time
+from typing import Any, Dict, List
+
+from tools.bench_publish import RecordingClient
+from tools.bench_queue import parsed_events
+from tools.common import format_latency_ms, make_config
+from app_utils.queue_operations import SafeQueue
+from classes.mqtt_sender import MqttHandler
+
+
+class TimingClient(RecordingClient):
+    def __init__(self, expected: int, done: threading.Event, queued_at: Dict[str, float]):
+        super().__init__(expected, done)
+        self.queued_at = queued_at
+        self.latencies: List[float] = []
+
+    def send_telemetry(self, telemetry: Any):
+        now = time.monotonic()
+        for entry in telemetry if isinstance(telemetry, list) else [telemetry]:
+            values = entry.get("values", entry)
+            self.latencies.append(now - self.queued_at[values["description"]])
+        return super().send_telemetry(telemetry)
+
+
+def legacy_loop(handler: MqttHandler) -> None:
+    # The publisher loop before wake-on-enqueue: poll, sleep 1 s when empty, 0.1 s after each publish
+    while not handler.shutdown_flag.is_set():
+        try:
+            message_type, message = handler.queue.get(block=False)
+            handler.dispatch(message_type, message)
+            time.sleep(0.1)
+        except queue.Empty:
+            time.sleep(1)
+
+
+def process_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(mode: str, events: List[Any], interval: float, idle_seconds: float) -> Dict[str, Any]:
+    message_queue = SafeQueue()
+    queued_at: Dict[str, float] = {}
+    done = threading.Event()
+    client = TimingClient(len(events), done, queued_at)
+    handler = MqttHandler(make_config(), message_queue, client)
+    handler.shutdown_flag = threading.Event()
+    loop = (lambda: legacy_loop(handler)) if mode == "poll" else handler.process_queue
+    publisher = threading.Thread(target=loop, daemon=True)
+    publisher.start()
+
+    cpu_before = process_cpu()
+    time.sleep(idle_seconds)
+    idle_cpu = (process_cpu() - cpu_before) / idle_seconds
+
+    for publish_type, message in events:
+        # Spaced out like live traffic, so every event finds the publisher idle
+        time.sleep(random.uniform(0, 2 * interval))
+        queued_at[message["description"]] = time.monotonic()
+        message_queue.put((publish_type, message))
+    done.wait(len(events) * 2 + 5)
+    handler.stop()
+    return {"latencies": client.latencies, "idle_cpu": idle_cpu}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enqueue-to-publish latency of an idle publisher: 1 s polling vs wake-on-enqueue.")
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.3, help="Mean seconds between events")
+    parser.add_argument("--idle-seconds", type=float, default=5, help="Idle period used to measure CPU use")
+    parser.add_argument("--modes", nargs="+", default=["poll", "wake"], choices=["poll", "wake"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    events = parsed_events(10002, args.events)
+    for mode in args.modes:
+        result = measure(mode, events, args.interval, args.idle_seconds)
+        print(f"{mode:5} enqueue->publish {format_latency_ms(result['latencies'])}; idle cpu {result['idle_cpu'] * 100:.3f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import threading
+from typing import Dict, List
+
+import yaml
+
+from tools.common import make_config
+from tools.fake_serial import FakeSerial
+from app_utils.queue_operations import SafeQueue
+from classes.panel_grammar import PanelGrammar
+from classes.specific_serial_handler import GrammarSerialHandler
+from config.schema import PanelGrammarConfig
+
+# Panels defined only in YAML, as a site would add them to panelGrammars.yml; none declares a report_delimiter
+YAML_PANELS = """
+20001:
+  name: Sin_Reportes_Bloques
+  framing:
+    mode: blank_line
+  rules:
+    - match: '(?P<event>.+?)\\s*\\|\\s*(?P<facp_date>\\S+\\s+\\S+)\\s*(?P<description>.*)'
+      event: {group: event}
+      facp_date: {group: facp_date}
+      description: {group: description}
+20002:
+  name: Sin_Reportes_Lineas
+  framing:
+    mode: line
+  rules:
+    - split: '\\s{3,}'
+      min_columns: 2
+      event: {columns: "0"}
+      description: {columns: "1:"}
+"""
+
+
+def capture(panel_id: int, events: int) -> bytes:
+    if panel_id == 20001:
+        return b"".join(f"ALRM ACT | 10:00:00 01/01/24 DET-{index:05d}\nPiso {index % 12}\n\n".encode('latin-1')
+                        for index in range(events))
+    return b"".join(f"ALARM:   DETECTOR {index:05d}   Z{index % 99:03d}\n".encode('latin-1') for index in range(events))
+
+
+def queued_events(panel_id: int, grammar: PanelGrammarConfig, events: int) -> List[str]:
+    shutdown_flag = threading.Event()
+    queue = SafeQueue()
+    handler = GrammarSerialHandler(make_config(id_modelo_panel=panel_id), {}, queue, PanelGrammar(panel_id, grammar))
+    handler.ser = FakeSerial(capture(panel_id, events), shutdown_flag)
+    handler.process_incoming_data(shutdown_flag)
+    return [message.get("event") for _, message in queue.queue]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Feed panels defined only in YAML, without a report_delimiter, through the grammar handler.")
+    parser.add_argument("--events", type=int, default=50)
+    args = parser.parse_args()
+
+    grammars: Dict[int, PanelGrammarConfig] = {int(panel_id): PanelGrammarConfig(**grammar)
+                                               for panel_id, grammar in yaml.safe_load(YAML_PANELS).items()}
+    failed = False
+    for panel_id, grammar in grammars.items():
+        events = queued_events(panel_id, grammar, args.events)
+        ok = len(events) == args.events and all(events)
+        failed = failed or not ok
+        print(f"{grammar.name:20} {grammar.framing.mode:10} queued={len(events)}/{args.events} {'ok' if ok else 'FAILED'}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
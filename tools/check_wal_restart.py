@@ -0,0 +1,113 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+from typing import Callable, Dict, List
+
+from app_utils.sqlite_queue import SqliteQueue
+from app_utils.write_ahead_log import SEGMENT_PATTERN, WriteAheadLog
+
+
+def open_log(directory: str) -> WriteAheadLog:
+    # A tiny segment size rotates on every enqueue, so each case controls exactly what the newest segment holds
+    log = WriteAheadLog(directory, segment_size=1, fsync="never")
+    log.scan()
+    return log
+
+
+def empty_tail(directory: str) -> None:
+    # First start creates an empty segment and stops before anything is queued
+    open_log(directory).close()
+
+
+def ack_only_tail(directory: str) -> None:
+    # Everything queued before the restart is delivered after it, so the newest segment holds only acks
+    log = open_log(directory)
+    for index in range(2):
+        log.append(("telemetry", {"index": index}))
+    log.close()
+    log = open_log(directory)
+    for sequence, _ in log.restore_chunk(log.unrestored_count):
+        log.ack(sequence)
+    log.close()
+
+
+CASES: Dict[str, Callable[[str], None]] = {"empty tail": empty_tail, "ack-only tail": ack_only_tail}
+
+
+def run_case(prepare: Callable[[str], None], count: int) -> List[str]:
+    directory = tempfile.mkdtemp(prefix="wal-restart-")
+    try:
+        prepare(directory)
+        log = open_log(directory)
+        items = [("telemetry", {"index": index}) for index in range(count)]
+        for item in items:
+            log.append(item)
+        log.close()
+
+        log = open_log(directory)
+        recovered = [item for _, item in log.restore_chunk(log.unrestored_count)]
+        active = log.segments[-1].path
+        log.close()
+        problems = []
+        if recovered != items:
+            problems.append(f"{len(recovered)} of {count} queued messages pending after restart")
+        if not os.path.exists(active):
+            problems.append(f"active segment {os.path.basename(active)} was removed")
+        paths = [segment.path for segment in log.segments]
+        if len(paths) != len(set(paths)):
+            problems.append("a segment file is listed twice")
+        if not glob.glob(os.path.join(directory, SEGMENT_PATTERN)):
+            problems.append("no segment left on disk")
+        return problems
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def requeue_order(count: int, taken: int) -> List[str]:
+    # The publisher takes a few messages, fails and requeues them newest first; the sqlite queue must then hand
+    # them out again before the rows it already prefetched, and the rest in the order they were queued
+    directory = tempfile.mkdtemp(prefix="sqlite-order-")
+    try:
+        sqlite_queue = SqliteQueue(os.path.join(directory, "queue.db"), fsync="never", prefetch=4)
+        for index in range(count):
+            sqlite_queue.put(("telemetry", {"index": index}))
+        failed = [sqlite_queue.get() for _ in range(taken)]
+        for item in reversed(failed):
+            sqlite_queue.requeue(item)
+        order = []
+        while not sqlite_queue.empty():
+            item = sqlite_queue.get()
+            order.append(item[1]["index"])
+            sqlite_queue.ack(item[1])
+        sqlite_queue.close()
+        if order != list(range(count)):
+            return [f"sqlite served {order} after requeueing {taken}"]
+        return []
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restart the queue log over an empty or ack-only newest segment and check nothing queued is lost, "
+                                                 "then check the sqlite queue serves requeued messages in order.")
+    parser.add_argument("--count", type=int, default=3, help="Messages queued between the two restarts")
+    args = parser.parse_args()
+
+    failed = False
+    for name, prepare in CASES.items():
+        problems = run_case(prepare, args.count)
+        failed = failed or bool(problems)
+        print(f"{name:14} {'ok' if not problems else 'FAILED: ' + '; '.join(problems)}")
+    # Requeued while prefetched rows wait in the lane buffer, and after the buffer ran dry
+    for taken in (3, 4):
+        problems = requeue_order(10, taken)
+        failed = failed or bool(problems)
+        print(f"{'requeue ' + str(taken):14} {'ok' if not problems else 'FAILED: ' + '; '.join(problems)}")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+import sys
+from typing import Any, Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from config.schema import ConfigSchema
+
+
+def make_config(puerto: str = "/dev/null", id_modelo_panel: int = 10001, **serial_overrides: Any) -> ConfigSchema:
+    config_data: Dict[str, Any] = {
+        "id_modelo_panel": id_modelo_panel,
+        "thingsboard": {"device_token": "BENCHMARK", "host": "localhost", "port": 1883},
+        "serial": {"puerto": puerto, **serial_overrides},
+        "relay": {"pin": 8, "high_time": 1, "low_time": 60},
+        "relay_monitor": {
+            "alarm_pin": 13,
+            "trouble_pin": 27,
+            "alarm_active_high": True,
+            "trouble_active_high": False,
+            "gpio_backend": "simulated"
+        }
+    }
+    return ConfigSchema(**config_data)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def format_latency_ms(samples: List[float]) -> str:
+    return (f"p50={percentile(samples, 50) * 1000:.2f}ms "
+            f"p95={percentile(samples, 95) * 1000:.2f}ms "
+            f"p99={percentile(samples, 99) * 1000:.2f}ms "
+            f"max={max(samples, default=0.0) * 1000:.2f}ms")
@@ -0,0 +1,146 @@
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import tty
+from typing import Any, Dict, List
+
+from tools.common import PROJECT_ROOT, format_latency_ms, make_config
+from tools.stub_broker import StubBroker
+from config.schema import RateLimitConfig
+
+# Each scenario: events written to the pty, their rate, and what happens around them
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    # Events spaced out like a quiet panel, every one finds the gateway idle
+    "idle": {"events": 30, "rate": 2},
+    # A burst far above the API limits, as when a whole floor goes into alarm
+    "storm": {"events": 3000, "rate": 1000},
+    # The broker goes away mid-stream and comes back; nothing may be lost
+    "outage": {"events": 600, "rate": 50, "outage_at": 3.0, "outage": 5.0},
+    # Sustained load above a tight API limit: throughput must sit at the limit, not below it
+    "ratelimit": {"events": 400, "rate": 100, "batch_size": 1, "rate_limits": [(20, 1)]},
+}
+
+
+def start_application(broker: StubBroker, puerto: str, workdir: str, batch_size: int, rate_limits: List[tuple] | None):
+    from app.core import Application
+    from config.loader import load_event_severity_levels, load_panel_grammars
+
+    config = make_config(puerto, 10001)
+    config.thingsboard.host = broker.host
+    config.thingsboard.port = broker.port
+    config.queue.path = os.path.join(workdir, "queue_wal")
+    config.queue.spill_path = os.path.join(workdir, "queue_spill")
+    config.publish.batch_size = batch_size
+    if rate_limits:
+        config.publish.rate_limits = [RateLimitConfig(messages=messages, period=period) for messages, period in rate_limits]
+    app = Application(
+        config,
+        load_event_severity_levels(os.path.join(PROJECT_ROOT, "config", "eventSeverityLevels.yml")),
+        load_panel_grammars(os.path.join(PROJECT_ROOT, "config", "panelGrammars.yml"))
+    )
+
+    ready = threading.Event()
+    serial_ready = app._serial_ready
+
+    def signal_ready(port: str) -> None:
+        serial_ready(port)
+        ready.set()
+
+    app._serial_ready = signal_ready
+    threading.Thread(target=app.start, name="application", daemon=True).start()
+    return app, ready
+
+
+def run_scenario(name: str, scenario: Dict[str, Any], batch_size: int, drain_timeout: float) -> Dict[str, Any]:
+    broker = StubBroker()
+    broker.start()
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    workdir = tempfile.mkdtemp(prefix=f"e2e-{name}-")
+    app, ready = start_application(broker, os.ttyname(slave), workdir, scenario.get("batch_size", batch_size),
+                                   scenario.get("rate_limits"))
+    if not ready.wait(30):
+        raise RuntimeError("Serial reader did not open the pty")
+
+    outage: Dict[str, float] = {}
+    if "outage" in scenario:
+        def break_broker() -> None:
+            time.sleep(scenario["outage_at"])
+            broker.stop()
+            outage["stopped"] = time.monotonic()
+            time.sleep(scenario["outage"])
+            broker.start()
+            outage["restarted"] = time.monotonic()
+        threading.Thread(target=break_broker, daemon=True).start()
+
+    written_at: Dict[str, float] = {}
+    interval = 1 / scenario["rate"]
+    started = time.monotonic()
+    for index in range(scenario["events"]):
+        # Paced against the start time so a slow write does not lower the offered rate
+        delay = started + index * interval - time.monotonic()
+        if name == "idle":
+            delay += random.uniform(-0.5, 0.5) * interval
+        if delay > 0:
+            time.sleep(delay)
+        key = f"{name.upper()}-{index:05d}"
+        written_at[key] = time.monotonic()
+        os.write(master, f"ALRM ACT | 10:00:00 01/01/24 {key}\n\n".encode('latin-1'))
+    written = time.monotonic()
+
+    deadline = written + drain_timeout
+    while len(broker.received) < len(written_at) and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    app.shutdown()
+    broker.stop()
+    os.close(master)
+    os.close(slave)
+
+    received = {key: broker.received[key] for key in written_at if key in broker.received}
+    latencies = [received[key] - sent for key, sent in written_at.items() if key in received]
+    last_receipt = max(received.values(), default=started)
+    recovery = None
+    if "restarted" in outage:
+        after = [receipt for receipt in received.values() if receipt >= outage["restarted"]]
+        recovery = min(after) - outage["restarted"] if after else None
+    return {
+        "events": len(written_at),
+        "delivered": len(received),
+        "duplicates": broker.duplicates,
+        "messages": broker.messages,
+        "connections": broker.connections,
+        "latencies": latencies,
+        "offered_rate": len(written_at) / max(written - started, 1e-9),
+        "sustained_rate": len(received) / max(last_receipt - started, 1e-9),
+        "recovery": recovery,
+        "reconnect": app.mqtt_handler.reconnect_latency.summary()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial-to-broker latency and throughput of the whole Application against a local stand-in broker.")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--batch-size", type=int, default=25, help="publish.batch_size for every scenario but ratelimit")
+    parser.add_argument("--drain-timeout", type=float, default=120, help="Seconds to wait for the broker to receive every event")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    for name in args.scenarios:
+        result = run_scenario(name, SCENARIOS[name], args.batch_size, args.drain_timeout)
+        line = (f"{name:9} delivered={result['delivered']}/{result['events']} dup={result['duplicates']} "
+                f"offered={result['offered_rate']:.0f}/s sustained={result['sustained_rate']:.0f}/s "
+                f"messages={result['messages']} serial->broker {format_latency_ms(result['latencies'])}")
+        if name == "outage":
+            recovery = f"{result['recovery']:.2f}s" if result["recovery"] is not None else "never"
+            line += (f" connections={result['connections']} first receipt after restart={recovery}"
+                     f" reconnect->first publish {result['reconnect']}")
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import threading
+
+
+class FakeSerial:
+    def __init__(self, data: bytes, shutdown_flag: threading.Event, chunk_size: int = 64):
+        self.data = memoryview(data)
+        self.position = 0
+        self.shutdown_flag = shutdown_flag
+        self.chunk_size = chunk_size
+        self.is_open = True
+
+    @property
+    def in_waiting(self) -> int:
+        remaining = len(self.data) - self.position
+        if remaining == 0:
+            # Capture exhausted: stop the handler loop the same way a shutdown would
+            self.shutdown_flag.set()
+        return min(remaining, self.chunk_size)
+
+    def readinto(self, buffer) -> int:
+        count = min(len(buffer), len(self.data) - self.position)
+        buffer[:count] = self.data[self.position:self.position + count]
+        self.position += count
+        return count
+
+    def read(self, size: int = 1) -> bytes:
+        chunk = bytes(self.data[self.position:self.position + size])
+        self.position += len(chunk)
+        return chunk
+
+    def readline(self) -> bytes:
+        end = bytes(self.data[self.position:]).find(b"\n")
+        end = len(self.data) if end < 0 else self.position + end + 1
+        line = bytes(self.data[self.position:end])
+        self.position = end
+        return line
+
+    def reset_input_buffer(self) -> None:
+        self.position = len(self.data)
+
+    def close(self) -> None:
+        self.is_open = False
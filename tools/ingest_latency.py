@@ -0,0 +1,77 @@
+import argparse
+import logging
+import os
+import random
+import resource
+import threading
+import time
+from typing import Dict, List
+
+from tools.common import make_config, format_latency_ms
+from app_utils.queue_operations import SafeQueue
+from classes.specific_serial_handler import Edwards_iO1000
+
+
+class TimestampingQueue(SafeQueue):
+    def __init__(self):
+        super().__init__()
+        self.queued_at: Dict[str, float] = {}
+
+    def put(self, item, block=True, timeout=None):
+        _, message = item
+        self.queued_at[message["description"]] = time.monotonic()
+        super().put(item, block, timeout)
+
+
+def measure(read_mode: str, events: int, interval: float, idle_seconds: float) -> None:
+    master, slave = os.openpty()
+    config = make_config(os.ttyname(slave), read_mode=read_mode)
+    queue = TimestampingQueue()
+    handler = Edwards_iO1000(config, {}, queue)
+    shutdown_flag = threading.Event()
+    reader = threading.Thread(target=handler.listening_to_serial, args=(shutdown_flag,), daemon=True)
+    reader.start()
+    time.sleep(0.5)
+
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    time.sleep(idle_seconds)
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    idle_wakeups = (usage_after.ru_nvcsw - usage_before.ru_nvcsw) / idle_seconds
+    idle_cpu = (usage_after.ru_utime + usage_after.ru_stime - usage_before.ru_utime - usage_before.ru_stime)
+
+    written_at: Dict[str, float] = {}
+    for index in range(events):
+        key = f"EVT{index}"
+        written_at[key] = time.monotonic()
+        os.write(master, f"ALRM ACT | 10:00:00 01/01/24 {key}\n\n".encode('latin-1'))
+        time.sleep(random.uniform(0.5, 1.5) * interval)
+
+    deadline = time.monotonic() + 2
+    while len(queue.queued_at) < events and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    shutdown_flag.set()
+    reader.join(timeout=5)
+    os.close(master)
+    os.close(slave)
+
+    latencies: List[float] = [queue.queued_at[key] - sent for key, sent in written_at.items() if key in queue.queued_at]
+    print(f"[{read_mode:6}] events={len(latencies)}/{events} ingest latency {format_latency_ms(latencies)} "
+          f"idle wakeups={idle_wakeups:.1f}/s idle cpu={idle_cpu * 1000:.1f}ms over {idle_seconds:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial ingest latency of the polling and selector read modes over a pty.")
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.05, help="Mean seconds between injected events")
+    parser.add_argument("--idle", type=float, default=5, help="Seconds of idle time used to count wakeups")
+    parser.add_argument("--modes", nargs="+", default=["poll", "select"], choices=["poll", "select"])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for read_mode in args.modes:
+        measure(read_mode, args.events, args.interval, args.idle)
+
+
+if __name__ == "__main__":
+    main()
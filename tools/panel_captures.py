@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+# (event id, is alarm) pairs in each panel's own vocabulary
+EDWARDS_IO1000_EVENTS: List[Tuple[str, bool]] = [("ALRM ACT", True), ("HUMO ACT", True), ("FALL ACT", False), ("SUPV ACT", False), ("HUMO RST", False)]
+EDWARDS_EST3X_EVENTS: List[Tuple[str, bool]] = [("ALARMA ACTIVA", True), ("PULSADOR ACTIVO", True), ("AVER. LOCAL ACT.", False), ("ALARMA RESTAUR.", False)]
+NOTIFIER_NFS_EVENTS: List[Tuple[str, bool]] = [("ALARM:", True), ("AVERIA MONITOR", False), ("SENAL SILENCIADA", False), ("SISTEMA NORMAL", False)]
+SIMPLEX_EVENTS: List[Tuple[str, bool]] = [("ALARM", True), ("TROUBLE", False), ("ABNORMAL", False), ("NORMAL", False)]
+
+
+def edwards_io1000_event(event_id: str, when: datetime, index: int) -> bytes:
+    return (f"{event_id} | {when:%H:%M:%S} {when:%m/%d/%y} DET-{index:05d} ZONA {index % 40}\n"
+            f"Piso {index % 12} Pasillo {index % 7}\n\n").encode('latin-1')
+
+
+def edwards_est3x_event(event_id: str, when: datetime, index: int) -> bytes:
+    return (f"{event_id}:: {when:%H:%M:%S} {when:%m/%d/%y} 01{index % 100:02d}{index % 1000:04d}\n"
+            f"Piso {index % 12} Sala {index % 9}\n\n").encode('latin-1')
+
+
+def notifier_nfs_event(event_id: str, when: datetime, index: int) -> bytes:
+    return (f"{event_id:<20}   DETECTOR HUMO {index:05d}   Z{index % 99:03d}   "
+            f"{when:%I:%M%p} {when:%m%d%y} L1D{index % 159:03d}\n").encode('latin-1')
+
+
+def simplex_event(event_id: str, when: datetime, index: int) -> bytes:
+    meridiem = "am" if when.hour < 12 else "pm"
+    return (f"{when.hour % 12 or 12}:{when:%M:%S} {meridiem}  {when.strftime('%a %d-%b-%y').upper()}"
+            f"\rZONE {index % 40}     SMOKE DETECTOR {index:05d}    {event_id}\r\r\n").encode('latin-1')
+
+
+def edwards_report(delimiter_count: int, lines: int, end_delimiter: str = "") -> bytes:
+    delimiter = "-" * 17
+    sections = []
+    for section in range(delimiter_count - 1):
+        sections.append(f"SECCION {section}\n" + "".join(f"Dispositivo {line:04d} NORMAL\n" for line in range(lines)))
+    report = delimiter + "\n" + (delimiter + "\n").join(sections) + delimiter + "\n"
+    if end_delimiter:
+        report += end_delimiter + "\n"
+    return (report + "\n").encode('latin-1')
+
+
+PANEL_FORMATS: Dict[int, Tuple[str, List[Tuple[str, bool]], Callable[[str, datetime, int], bytes]]] = {
+    10001: ("Edwards_iO1000", EDWARDS_IO1000_EVENTS, edwards_io1000_event),
+    10002: ("Edwards_EST3x", EDWARDS_EST3X_EVENTS, edwards_est3x_event),
+    10003: ("Notifier_NFS", NOTIFIER_NFS_EVENTS, notifier_nfs_event),
+    10004: ("Simplex", SIMPLEX_EVENTS, simplex_event),
+}
+
+REPORT_FORMATS: Dict[int, Callable[[int], bytes]] = {
+    10001: lambda lines: edwards_report(4, lines),
+    10002: lambda lines: edwards_report(2, lines, "**"),
+}
+
+
+def synthetic_events(panel_id: int, events: int, alarm_ratio: float = 0.2, seed: int = 0) -> List[bytes]:
+    _, vocabulary, formatter = PANEL_FORMATS[panel_id]
+    alarms = [event_id for event_id, is_alarm in vocabulary if is_alarm]
+    others = [event_id for event_id, is_alarm in vocabulary if not is_alarm]
+    rng = random.Random(seed)
+    start = datetime(2025, 2, 23, 10, 0, 0)
+    frames = []
+    for index in range(events):
+        event_id = rng.choice(alarms if rng.random() < alarm_ratio else others)
+        frames.append(formatter(event_id, start + timedelta(seconds=index), index))
+    return frames
+
+
+def synthetic_capture(panel_id: int, events: int, alarm_ratio: float = 0.2, report_every: int = 0,
+                      report_lines: int = 50, seed: int = 0) -> bytes:
+    frames = synthetic_events(panel_id, events, alarm_ratio, seed)
+    report = REPORT_FORMATS.get(panel_id)
+    if report_every and report:
+        block = report(report_lines)
+        frames = [frame + block if (index + 1) % report_every == 0 else frame for index, frame in enumerate(frames)]
+    return b"".join(frames)
@@ -0,0 +1,192 @@
+import argparse
+import logging
+import os
+import threading
+import time
+import tty
+from typing import List, Tuple
+
+import yaml
+
+from tools.common import PROJECT_ROOT
+from tools.panel_captures import PANEL_FORMATS, synthetic_events
+from classes.panel_grammar import load_default_grammar
+from config.loader import load_yaml
+
+TICK = 0.01
+
+
+class VirtualPanel:
+    def __init__(self, link: str | None = None):
+        self.master, self.slave = os.openpty()
+        # Raw and without echo, otherwise the line discipline would echo every byte back to us
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.port, link)
+        self.bytes_written = 0
+        self.frames_written = 0
+
+    @property
+    def puerto(self) -> str:
+        return self.link or self.port
+
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            written = os.write(self.master, view)
+            view = view[written:]
+        self.bytes_written += len(data)
+
+    def play(self, frames: List[bytes], bytes_per_second: float, stop: threading.Event) -> None:
+        budget = 0.0
+        last = time.monotonic()
+        for frame in frames:
+            while budget < len(frame) and not stop.is_set():
+                time.sleep(TICK)
+                now = time.monotonic()
+                budget += (now - last) * bytes_per_second
+                last = now
+            if stop.is_set():
+                return
+            budget -= len(frame)
+            self.write(frame)
+            self.frames_written += 1
+
+    def close(self) -> None:
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master)
+        os.close(self.slave)
+
+
+def load_frames(args: argparse.Namespace) -> Tuple[List[bytes], str]:
+    if args.replay:
+        with open(args.replay, 'rb') as capture_file:
+            data = capture_file.read()
+        # Replay line by line so pacing stays smooth and counters mean something
+        frames = data.splitlines(keepends=True)
+        return frames, f"replay of {args.replay} ({len(data)} bytes)"
+    frames = synthetic_events(args.model, args.storm, args.alarm_ratio, args.seed)
+    return frames, f"{PANEL_FORMATS[args.model][0]} storm of {args.storm} events"
+
+
+def write_config(base_config: str, output: str, puerto: str, model: int) -> None:
+    config_data = load_yaml(base_config)
+    config_data["serial"]["puerto"] = puerto
+    config_data["id_modelo_panel"] = model
+    with open(output, 'w') as config_file:
+        yaml.safe_dump(config_data, config_file, sort_keys=False)
+
+
+def start_application(base_config: str, puerto: str, model: int):
+    from app.core import Application
+    from config.loader import load_and_validate_config, load_event_severity_levels, load_panel_grammars
+
+    config = load_and_validate_config(base_config)
+    config.serial.puerto = puerto
+    config.id_modelo_panel = model
+    app = Application(
+        config,
+        load_event_severity_levels(os.path.join(PROJECT_ROOT, "config", "eventSeverityLevels.yml")),
+        load_panel_grammars(os.path.join(PROJECT_ROOT, "config", "panelGrammars.yml"))
+    )
+
+    counters = {"queued": 0, "dequeued": 0}
+    put, get, get_batch = app.queue.put, app.queue.get, app.queue.get_batch
+
+    def counting_put(item, block=True, timeout=None):
+        counters["queued"] += 1
+        put(item, block, timeout)
+
+    def counting_get(block=True, timeout=None):
+        item = get(block, timeout)
+        counters["dequeued"] += 1
+        return item
+
+    def counting_get_batch(count):
+        # The publisher drains through get_batch when publish.batch_size is above 1
+        items = get_batch(count)
+        counters["dequeued"] += len(items)
+        return items
+
+    app.queue.put = counting_put
+    app.queue.get = counting_get
+    app.queue.get_batch = counting_get_batch
+    threading.Thread(target=app.start, name="application", daemon=True).start()
+    return app, counters
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate a fire alarm panel on a pseudo-terminal.")
+    parser.add_argument("--model", type=int, default=10001, choices=sorted(PANEL_FORMATS), help="Panel wire format")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="CAPTURE", help="Raw capture file to replay")
+    source.add_argument("--storm", type=int, default=1000, metavar="EVENTS", help="Synthetic alarm storm size")
+    parser.add_argument("--alarm-ratio", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed relative to the panel baud rate (1-1000)")
+    parser.add_argument("--baudrate", type=int, help="Override the baud rate from the panel grammar used for pacing")
+    parser.add_argument("--link", help="Create a symlink to the pty, e.g. /tmp/virtual-serial")
+    parser.add_argument("--config", default=os.path.join(PROJECT_ROOT, "config", "config.yml"), help="Base application config")
+    parser.add_argument("--write-config", metavar="PATH", help="Write a copy of --config with serial.puerto pointing at the pty")
+    parser.add_argument("--run-app", action="store_true", help="Run the full Application against the pty in this process")
+    parser.add_argument("--delay", type=float, default=0, help="Seconds to wait before playback so a reader can open the port")
+    parser.add_argument("--drain-timeout", type=float, default=30, help="Seconds to wait for the queue to drain with --run-app")
+    args = parser.parse_args()
+
+    if not 1 <= args.speed <= 1000:
+        parser.error("--speed must be between 1 and 1000")
+
+    logging.basicConfig(level=logging.WARNING)
+    panel = VirtualPanel(args.link)
+    print(f"Virtual panel listening on {panel.puerto}")
+
+    if args.write_config:
+        write_config(args.config, args.write_config, panel.puerto, args.model)
+        print(f"Config with serial.puerto={panel.puerto} written to {args.write_config}")
+
+    app, counters = (None, None)
+    if args.run_app:
+        app, counters = start_application(args.config, panel.puerto, args.model)
+    time.sleep(args.delay or (2 if args.run_app else 0))
+
+    frames, description = load_frames(args)
+    baudrate = args.baudrate or load_default_grammar(args.model).serial_config["baudrate"]
+    bytes_per_second = baudrate / 10 * args.speed
+    print(f"Playing {description} at {args.speed:g}x ({bytes_per_second:.0f} bytes/s)")
+
+    stop = threading.Event()
+    player = threading.Thread(target=panel.play, args=(frames, bytes_per_second, stop), daemon=True)
+    started = time.monotonic()
+    player.start()
+    try:
+        drain_deadline = None
+        while True:
+            time.sleep(1)
+            elapsed = time.monotonic() - started
+            line = f"t={elapsed:6.1f}s written={panel.frames_written}/{len(frames)} bytes={panel.bytes_written}"
+            if app is not None:
+                line += (f" queued={counters['queued']} dequeued={counters['dequeued']} backlog={app.queue.qsize()}"
+                         f" ingest={counters['queued'] / elapsed:.1f}/s drain={counters['dequeued'] / elapsed:.1f}/s")
+            print(line)
+            if player.is_alive():
+                continue
+            if app is None:
+                break
+            drain_deadline = drain_deadline or time.monotonic() + args.drain_timeout
+            if app.queue.qsize() == 0 or time.monotonic() > drain_deadline:
+                break
+    except KeyboardInterrupt:
+        stop.set()
+    finally:
+        if app is not None:
+            app.shutdown()
+        panel.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from itertools import accumulate
+from typing import List, Tuple
+
+from tools.common import PROJECT_ROOT, make_config
+from tools.fake_serial import FakeSerial
+from app_utils.queue_operations import SafeQueue
+from app_utils.serial_journal import journal_directory, read_journal
+from app_utils.timestamps import ArrivalStamp, format_sbc_date
+from classes.panel_grammar import load_default_grammar
+from classes.specific_serial_handler import GrammarSerialHandler
+from config.loader import load_event_severity_levels
+
+
+def parse_time(value: str) -> int:
+    try:
+        return int(float(value) * 1_000_000)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp() * 1_000_000)
+
+
+def select_records(directory: str, since_us: int | None, until_us: int | None, last: float | None) -> List[Tuple[int, bytes]]:
+    records = list(read_journal(directory, since_us, until_us))
+    if last is not None and records:
+        cutoff = records[-1][0] - int(last * 1_000_000)
+        records = [record for record in records if record[0] >= cutoff]
+    return records
+
+
+class JournalSerial(FakeSerial):
+    # Serves the journal one record at a time, so every read is stamped with the wall clock it was journaled at
+    def __init__(self, records: List[Tuple[int, bytes]], shutdown_flag: threading.Event, chunk_size: int = 64):
+        super().__init__(b"".join(payload for _, payload in records), shutdown_flag, chunk_size)
+        self.record_ends = list(accumulate(len(payload) for _, payload in records))
+        self.record_walls = [wall_us for wall_us, _ in records]
+        self.record = 0
+        self.wall_us = self.record_walls[0] if records else 0
+
+    def record_remaining(self) -> int:
+        while self.record < len(self.record_ends) - 1 and self.record_ends[self.record] <= self.position:
+            self.record += 1
+        return max(self.record_ends[self.record] - self.position, 0) if self.record_ends else 0
+
+    @property
+    def in_waiting(self) -> int:
+        return min(super().in_waiting, self.record_remaining())
+
+    def readinto(self, buffer) -> int:
+        remaining = self.record_remaining()
+        self.wall_us = self.record_walls[self.record] if self.record_walls else 0
+        with memoryview(buffer) as view:
+            return super().readinto(view[:remaining])
+
+    def stamp(self) -> ArrivalStamp:
+        return self.wall_us, time.monotonic_ns()
+
+
+def replay(records: List[Tuple[int, bytes]], model: int, chunk_size: int) -> SafeQueue:
+    shutdown_flag = threading.Event()
+    queue = SafeQueue()
+    severity_levels = load_event_severity_levels(os.path.join(PROJECT_ROOT, "config", "eventSeverityLevels.yml"))
+    handler = GrammarSerialHandler(make_config(id_modelo_panel=model), severity_levels.get(model, {}), queue,
+                                   load_default_grammar(model))
+    handler.ser = JournalSerial(records, shutdown_flag, chunk_size)
+    # SBC_date of every replayed event is when its first byte was read from the panel, not when it was replayed
+    handler.read_stamp = handler.ser.stamp
+    handler.process_incoming_data(shutdown_flag)
+    return queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay raw serial bytes from the journal through a panel handler.")
+    parser.add_argument("--journal", default=os.path.join(PROJECT_ROOT, "journal"), help="Journal directory from the config")
+    parser.add_argument("--port", help="Serial port the journal was recorded from; selects its subdirectory")
+    parser.add_argument("--model", type=int, required=True, help="Panel model whose handler parses the bytes")
+    parser.add_argument("--since", type=parse_time, help="Start time, epoch seconds or ISO date")
+    parser.add_argument("--until", type=parse_time, help="End time, epoch seconds or ISO date")
+    parser.add_argument("--last", type=float, metavar="SECONDS", help="Only the last SECONDS of the selection")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Bytes the fake port reports in in_waiting per read")
+    parser.add_argument("--dump", metavar="PATH", help="Write the raw slice to a capture file instead of parsing it")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level)
+    directory = journal_directory(args.journal, args.port) if args.port else args.journal
+    records = select_records(directory, args.since, args.until, args.last)
+    if not records:
+        print(f"No journal records found in {directory}", file=sys.stderr)
+        sys.exit(1)
+
+    data = b"".join(payload for _, payload in records)
+    print(f"{len(records)} reads, {len(data)} bytes from {format_sbc_date(records[0][0])} "
+          f"to {format_sbc_date(records[-1][0])}", file=sys.stderr)
+
+    if args.dump:
+        # Same format the panel simulator and the parser benchmark take as a capture
+        with open(args.dump, 'wb') as capture_file:
+            capture_file.write(data)
+        return
+
+    queue = replay(records, args.model, args.chunk_size)
+    while not queue.empty():
+        publish_type, message = queue.get()
+        message = {key: value for key, value in message.items() if not key.startswith("_")}
+        if "SBC_date" in message:
+            message["SBC_date"] = format_sbc_date(message["SBC_date"])
+        print(json.dumps({"type": publish_type.name, **message}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+TELEMETRY_TOPIC = "v1/devices/me/telemetry"
+RPC_REQUEST_TOPIC = "v1/devices/me/rpc/request/"
+RPC_RESPONSE_TOPIC = "v1/devices/me/rpc/response/"
+# Answer to the client's getSessionLimits call: no limits on the platform side, only the gateway's own
+SESSION_LIMITS = {"maxInflightMessages": 100, "rateLimits": {}, "maxPayloadSize": 65536}
+
+CONNECT, PUBLISH, PUBACK, SUBSCRIBE, UNSUBSCRIBE, PINGREQ, DISCONNECT = 1, 3, 4, 8, 10, 12, 14
+
+
+def encode_length(length: int) -> bytes:
+    encoded = bytearray()
+    while True:
+        length, digit = divmod(length, 128)
+        encoded.append(digit | (0x80 if length else 0))
+        if not length:
+            return bytes(encoded)
+
+
+def decode_length(data: bytes, offset: int) -> Tuple[int, int]:
+    length, shift = 0, 0
+    while True:
+        digit = data[offset]
+        offset += 1
+        length |= (digit & 0x7F) << shift
+        shift += 7
+        if not digit & 0x80:
+            return length, offset
+
+
+def read_string(data: bytes, offset: int) -> Tuple[str, int]:
+    length = struct.unpack_from(">H", data, offset)[0]
+    offset += 2
+    return data[offset:offset + length].decode('utf-8'), offset + length
+
+
+def packet(packet_type: int, flags: int, body: bytes) -> bytes:
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+class BrokerSession:
+    # One client connection: just enough MQTT 3.1.1 and 5 for a ThingsBoard device client
+    def __init__(self, broker: "StubBroker", sock: socket.socket):
+        self.broker = broker
+        self.sock = sock
+        self.v5 = False
+        self.send_lock = threading.Lock()
+
+    def send(self, data: bytes) -> None:
+        with self.send_lock:
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                pass
+
+    def read_exact(self, count: int) -> bytes:
+        data = bytearray()
+        while len(data) < count:
+            chunk = self.sock.recv(count - len(data))
+            if not chunk:
+                raise ConnectionError("Client closed the connection")
+            data += chunk
+        return bytes(data)
+
+    def read_packet(self) -> Tuple[int, int, bytes]:
+        header = self.read_exact(1)[0]
+        length, shift = 0, 0
+        while True:
+            digit = self.read_exact(1)[0]
+            length |= (digit & 0x7F) << shift
+            shift += 7
+            if not digit & 0x80:
+                break
+        return header >> 4, header & 0x0F, self.read_exact(length)
+
+    def serve(self) -> None:
+        try:
+            while True:
+                packet_type, flags, body = self.read_packet()
+                if packet_type == CONNECT:
+                    self.on_connect(body)
+                elif packet_type == PUBLISH:
+                    self.on_publish(flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self.on_subscribe(body)
+                elif packet_type == UNSUBSCRIBE:
+                    self.send(packet(11, 0, body[:2] + (b"\x00\x00" if self.v5 else b"")))
+                elif packet_type == PINGREQ:
+                    self.send(packet(13, 0, b""))
+                elif packet_type == DISCONNECT:
+                    break
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.broker.forget(self)
+            self.sock.close()
+
+    def on_connect(self, body: bytes) -> None:
+        _, offset = read_string(body, 0)
+        self.v5 = body[offset] == 5
+        self.send(packet(2, 0, b"\x00\x00\x00" if self.v5 else b"\x00\x00"))
+        self.broker.connections += 1
+
+    def on_publish(self, flags: int, body: bytes) -> None:
+        received_at = time.monotonic()
+        qos = (flags >> 1) & 3
+        topic, offset = read_string(body, 0)
+        packet_id = body[offset:offset + 2]
+        if qos:
+            offset += 2
+        if self.v5:
+            properties, offset = decode_length(body, offset)
+            offset += properties
+        payload = body[offset:]
+        if topic == TELEMETRY_TOPIC:
+            self.broker.record(received_at, payload)
+        elif topic.startswith(RPC_REQUEST_TOPIC):
+            self.publish(RPC_RESPONSE_TOPIC + topic[len(RPC_REQUEST_TOPIC):], json.dumps(SESSION_LIMITS).encode())
+        if qos == 1:
+            if self.broker.ack_delay:
+                threading.Timer(self.broker.ack_delay, self.send, args=(packet(PUBACK, 0, packet_id),)).start()
+            else:
+                self.send(packet(PUBACK, 0, packet_id))
+
+    def on_subscribe(self, body: bytes) -> None:
+        packet_id, offset = body[:2], 2
+        if self.v5:
+            properties, offset = decode_length(body, offset)
+            offset += properties
+        codes = bytearray()
+        while offset < len(body):
+            _, offset = read_string(body, offset)
+            codes.append(body[offset] & 0x03)
+            offset += 1
+        self.send(packet(9, 0, packet_id + (b"\x00" if self.v5 else b"") + bytes(codes)))
+
+    def publish(self, topic: str, payload: bytes) -> None:
+        encoded_topic = topic.encode('utf-8')
+        body = struct.pack(">H", len(encoded_topic)) + encoded_topic + (b"\x00" if self.v5 else b"") + payload
+        self.send(packet(PUBLISH, 0, body))
+
+
+class StubBroker:
+    # Stand-in for ThingsBoard's MQTT transport on localhost; records when every telemetry entry arrived
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, ack_delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.ack_delay = ack_delay
+        self.server: socket.socket | None = None
+        self.sessions: List[BrokerSession] = []
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = 0
+        # description -> monotonic time of first receipt; repeats count redeliveries
+        self.received: Dict[str, float] = {}
+        self.duplicates = 0
+        self.other_entries = 0
+        self.logger = logging.getLogger(__name__)
+
+    def start(self) -> None:
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        # Restarting after an outage keeps the port the gateway is configured with
+        self.port = self.server.getsockname()[1]
+        self.server.listen(8)
+        threading.Thread(target=self.accept, args=(self.server,), name="stub-broker", daemon=True).start()
+
+    def accept(self, server: socket.socket) -> None:
+        while True:
+            try:
+                sock, _ = server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = BrokerSession(self, sock)
+            with self.lock:
+                self.sessions.append(session)
+            threading.Thread(target=session.serve, name="stub-broker-session", daemon=True).start()
+
+    def stop(self) -> None:
+        # Drops every client without a DISCONNECT, like a broker that crashed or a link that went down
+        if self.server is not None:
+            # shutdown wakes the accept thread; close alone would leave the port listening
+            try:
+                self.server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server.close()
+            self.server = None
+        with self.lock:
+            sessions, self.sessions = self.sessions, []
+        for session in sessions:
+            try:
+                session.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            session.sock.close()
+
+    def forget(self, session: BrokerSession) -> None:
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def record(self, received_at: float, payload: bytes) -> None:
+        try:
+            telemetry: Any = json.loads(payload)
+        except ValueError:
+            self.logger.error(f"Telemetry that is not JSON: {payload[:80]!r}")
+            return
+        with self.lock:
+            self.messages += 1
+            for entry in telemetry if isinstance(telemetry, list) else [telemetry]:
+                values = entry.get("values", entry) if isinstance(entry, dict) else {}
+                description = values.get("description")
+                if description is None:
+                    self.other_entries += 1
+                elif description in self.received:
+                    self.duplicates += 1
+                else:
+                    self.received[description] = received_at